@@ -0,0 +1,198 @@
+from array import array
+from typing import Dict, List, Optional, Tuple, Iterable
+import math
+import os
+import time
+
+# How far back each ring reaches, and the HyperLogLog register count (2**precision bytes per hour bucket)
+MINUTE_BUCKETS = 60
+HOUR_BUCKETS = int(os.getenv("ACTIVITY_HOURS", "24"))
+HLL_PRECISION = int(os.getenv("ACTIVITY_HLL_PRECISION", "8"))
+
+_MASK64 = (1 << 64) - 1
+
+def _mix64(value: int) -> int:
+    """splitmix64 finalizer: spreads snowflake IDs evenly over 64 bits"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+class HyperLogLog:
+    """Approximate distinct count in a fixed 2**precision bytes (about 6.5% error at precision 8)"""
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, item: int) -> None:
+        hashed = _mix64(item)
+        index = hashed & ((1 << self.precision) - 1)
+        rest = hashed >> self.precision
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def clear(self) -> None:
+        self.registers = bytearray(len(self.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction: linear counting is more accurate here
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+class ActivitySeries:
+    """Message counts per minute and per hour plus unique users per hour, in fixed-size rings.
+
+    Each slot remembers which minute/hour it holds, so a stale slot is reset
+    when reused and ignored by queries; nothing ever has to be swept.
+    """
+    __slots__ = ("minute_stamps", "minute_counts", "hour_stamps", "hour_counts", "hour_users")
+
+    def __init__(self):
+        self.minute_stamps = array("q", [-1] * MINUTE_BUCKETS)
+        self.minute_counts = array("I", [0] * MINUTE_BUCKETS)
+        self.hour_stamps = array("q", [-1] * HOUR_BUCKETS)
+        self.hour_counts = array("I", [0] * HOUR_BUCKETS)
+        self.hour_users = [HyperLogLog() for _ in range(HOUR_BUCKETS)]
+
+    def record(self, user_id: int, minute: int) -> None:
+        # A slot already holding a newer period means this event has aged out of that ring
+        slot = minute % MINUTE_BUCKETS
+        stamp = self.minute_stamps[slot]
+        if stamp < minute:
+            self.minute_stamps[slot] = minute
+            self.minute_counts[slot] = 0
+        if stamp <= minute:
+            self.minute_counts[slot] += 1
+
+        hour = minute // 60
+        slot = hour % HOUR_BUCKETS
+        stamp = self.hour_stamps[slot]
+        if stamp < hour:
+            self.hour_stamps[slot] = hour
+            self.hour_counts[slot] = 0
+            self.hour_users[slot].clear()
+        if stamp <= hour:
+            self.hour_counts[slot] += 1
+            self.hour_users[slot].add(user_id)
+
+    def messages_last_minutes(self, minutes: int, now_minute: int) -> int:
+        oldest = now_minute - min(minutes, MINUTE_BUCKETS) + 1
+        return sum(count for stamp, count in zip(self.minute_stamps, self.minute_counts) if oldest <= stamp <= now_minute)
+
+    def messages_last_hours(self, hours: int, now_minute: int) -> int:
+        now_hour = now_minute // 60
+        oldest = now_hour - min(hours, HOUR_BUCKETS) + 1
+        return sum(count for stamp, count in zip(self.hour_stamps, self.hour_counts) if oldest <= stamp <= now_hour)
+
+    def unique_users(self, hours: int, now_minute: int) -> int:
+        """Estimated distinct authors over the last ``hours`` hour buckets (the current one included)"""
+        now_hour = now_minute // 60
+        oldest = now_hour - min(hours, HOUR_BUCKETS) + 1
+        union = HyperLogLog()
+        for stamp, users in zip(self.hour_stamps, self.hour_users):
+            if oldest <= stamp <= now_hour:
+                union.merge(users)
+        return union.count()
+
+    def minute_histogram(self, now_minute: int) -> List[int]:
+        """Messages per minute for the last hour, oldest first"""
+        return [
+            self.minute_counts[minute % MINUTE_BUCKETS] if self.minute_stamps[minute % MINUTE_BUCKETS] == minute else 0
+            for minute in range(now_minute - MINUTE_BUCKETS + 1, now_minute + 1)
+        ]
+
+    def last_active_minute(self) -> int:
+        return max(max(self.minute_stamps), max(self.hour_stamps) * 60)
+
+    def dump(self) -> tuple:
+        return (self.minute_stamps.tobytes(), self.minute_counts.tobytes(), self.hour_stamps.tobytes(),
+                self.hour_counts.tobytes(), [bytes(users.registers) for users in self.hour_users])
+
+    @classmethod
+    def restore(cls, data: tuple) -> Optional["ActivitySeries"]:
+        series = cls()
+        minute_stamps, minute_counts, hour_stamps, hour_counts, hour_users = data
+        for target, raw in ((series.minute_stamps, minute_stamps), (series.minute_counts, minute_counts),
+                            (series.hour_stamps, hour_stamps), (series.hour_counts, hour_counts)):
+            restored = array(target.typecode)
+            restored.frombytes(raw)
+            if len(restored) != len(target):
+                # Ring sizes changed since the snapshot; start this series fresh
+                return None
+            target[:] = restored
+        if len(hour_users) != HOUR_BUCKETS or any(len(raw) != 1 << HLL_PRECISION for raw in hour_users):
+            return None
+        series.hour_users = [HyperLogLog(registers=bytearray(raw)) for raw in hour_users]
+        return series
+
+# (guild_id, channel_id); channel_id None holds the guild-wide rollup
+SeriesKey = Tuple[int, Optional[int]]
+
+class ActivityTracker:
+    """Rollups per guild and per channel; memory depends on channel count, never on user count"""
+
+    def __init__(self):
+        self.series: Dict[SeriesKey, ActivitySeries] = {}
+
+    @staticmethod
+    def now_minute(timestamp: Optional[float] = None) -> int:
+        return int((timestamp if timestamp is not None else time.time()) // 60)
+
+    def record(self, guild_id: int, channel_id: int, user_id: int, timestamp: Optional[float] = None) -> None:
+        minute = self.now_minute(timestamp)
+        for key in ((guild_id, None), (guild_id, channel_id)):
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = ActivitySeries()
+            series.record(user_id, minute)
+
+    def guild(self, guild_id: int) -> Optional[ActivitySeries]:
+        return self.series.get((guild_id, None))
+
+    def channel(self, guild_id: int, channel_id: int) -> Optional[ActivitySeries]:
+        return self.series.get((guild_id, channel_id))
+
+    def top_channels(self, guild_id: int, channel_ids: Iterable[int], minutes: int = 60,
+                     limit: int = 5) -> List[Tuple[int, int]]:
+        """Busiest of the given channels over the last ``minutes`` minutes as (channel_id, messages)"""
+        now = self.now_minute()
+        ranked = []
+        for channel_id in channel_ids:
+            series = self.series.get((guild_id, channel_id))
+            if series is not None:
+                count = series.messages_last_minutes(minutes, now)
+                if count:
+                    ranked.append((channel_id, count))
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def prune(self) -> int:
+        """Drop series with nothing left inside any ring; returns how many were removed"""
+        oldest = self.now_minute() - HOUR_BUCKETS * 60
+        stale = [key for key, series in self.series.items() if series.last_active_minute() < oldest]
+        for key in stale:
+            del self.series[key]
+        return len(stale)
+
+    def dump(self) -> dict:
+        return {key: series.dump() for key, series in self.series.items()}
+
+    def restore(self, data: dict) -> None:
+        self.series.clear()
+        for key, raw in data.items():
+            series = ActivitySeries.restore(raw)
+            if series is not None:
+                self.series[key] = series
+
+activity = ActivityTracker()
@@ -0,0 +1,158 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Sequence
+import os
+import time
+import discord
+import moderation
+from modlog import mod_log
+
+# Characters people use to dodge filters
+LEET_MAP = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s"}
+ZERO_WIDTH = ["\u200b", "\u200c", "\u200d", "\u2060", "\ufeff", "\u00ad"]
+NORMALIZE_TABLE = str.maketrans({**LEET_MAP, **{ch: None for ch in ZERO_WIDTH}})
+
+# Warn counts are kept for at most this many members, and forgotten after this long without a new warning
+WARN_TRACKING_LIMIT = int(os.getenv("AUTOMOD_WARN_TRACKING_LIMIT", "10000"))
+WARN_DECAY_SECONDS = int(os.getenv("AUTOMOD_WARN_DECAY_SECONDS", "3600"))
+
+def normalize(text: str) -> str:
+    """Casefold, undo leetspeak and strip zero-width characters"""
+    return text.casefold().translate(NORMALIZE_TABLE)
+
+class WordFilter:
+    """Aho-Corasick automaton over a guild's normalized banned words.
+
+    One pass over the message finds every banned word regardless of how
+    many there are. A hit only counts when it isn't glued to other letters,
+    so "class" doesn't trip a filter on "ass".
+    """
+    __slots__ = ("goto", "fail", "output")
+
+    def __init__(self, words: Sequence[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.output: List[Tuple[str, ...]] = [()]
+
+        for word in words:
+            word = normalize(word.strip())
+            if not word:
+                continue
+            state = 0
+            for ch in word:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.output.append(())
+                state = nxt
+            self.output[state] += (word,)
+
+        # Breadth-first pass to fill in failure links and merge outputs
+        self.fail = [0] * len(self.goto)
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                link = self.goto[fallback].get(ch, 0)
+                self.fail[nxt] = link if link != nxt else 0
+                self.output[nxt] += self.output[self.fail[nxt]]
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the first banned word found in text, or None"""
+        text = normalize(text)
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for word in output[state]:
+                    start = i - len(word) + 1
+                    before = text[start - 1] if start > 0 else " "
+                    after = text[i + 1] if i + 1 < len(text) else " "
+                    if not before.isalpha() and not after.isalpha():
+                        return word
+        return None
+
+class WarnTracker:
+    """Bounded LRU of (guild, member) -> recent warning count"""
+
+    def __init__(self, limit: int = WARN_TRACKING_LIMIT, decay: int = WARN_DECAY_SECONDS):
+        self.limit = limit
+        self.decay = decay
+        self.warnings: "OrderedDict[Tuple[int, int], Tuple[int, float]]" = OrderedDict()
+
+    def warn(self, guild_id: int, member_id: int) -> int:
+        """Record a warning and return the member's current count"""
+        key = (guild_id, member_id)
+        now = time.time()
+        count, last = self.warnings.pop(key, (0, now))
+        if now - last > self.decay:
+            count = 0
+        self.warnings[key] = (count + 1, now)
+        while len(self.warnings) > self.limit:
+            self.warnings.popitem(last=False)
+        return count + 1
+
+    def clear(self, guild_id: int, member_id: int) -> None:
+        self.warnings.pop((guild_id, member_id), None)
+
+class Automod:
+    """Per-guild banned word enforcement for the message hot path"""
+
+    def __init__(self):
+        # guild_id -> (the banned words tuple it was built from, filter)
+        self.filters: Dict[int, Tuple[Tuple[str, ...], WordFilter]] = {}
+        self.warnings = WarnTracker()
+
+    def filter_for(self, guild_id: int, words: Tuple[str, ...]) -> WordFilter:
+        """Cached filter for a guild, rebuilt when its banned words change"""
+        cached = self.filters.get(guild_id)
+        # Config views hand back the same tuple until the setting changes, so identity is the fast path
+        if cached is not None and (cached[0] is words or cached[0] == words):
+            return cached[1]
+        word_filter = WordFilter(words)
+        self.filters[guild_id] = (words, word_filter)
+        return word_filter
+
+    async def check(self, message: discord.Message, settings) -> bool:
+        """Enforce the guild's word filter; returns True if the message was removed"""
+        if not settings.automod_enabled or not settings.automod_banned_words:
+            return False
+        # Webhooks and moderators are exempt
+        if not isinstance(message.author, discord.Member) or message.author.guild_permissions.manage_messages:
+            return False
+
+        word = self.filter_for(message.guild.id, settings.automod_banned_words).search(message.content)
+        if word is None:
+            return False
+
+        try:
+            await message.delete()
+        except discord.HTTPException as e:
+            print(f"Automod could not delete message {message.id}: {str(e)}")
+
+        count = self.warnings.warn(message.guild.id, message.author.id)
+        threshold = settings.automod_warn_threshold
+        if count >= threshold:
+            self.warnings.clear(message.guild.id, message.author.id)
+            minutes = settings.automod_mute_minutes
+            reason = f"Automod: {threshold} banned word warnings"
+            if await moderation.mute_user(message.author, minutes, reason=reason):
+                mod_log.record(message.guild, "mute", message.author, message.guild.me, reason, settings,
+                               details=f"Muted for {minutes} minutes")
+                await message.channel.send(f"🔇 {message.author.mention} has been muted for {minutes} minutes.")
+        else:
+            mod_log.record(message.guild, "warn", message.author, message.guild.me,
+                           f"Automod: banned word ({count}/{threshold})", settings, details=f"In {message.channel.mention}")
+            await message.channel.send(
+                f"⚠️ {message.author.mention}, that word isn't allowed here (warning {count}/{threshold}).",
+                delete_after=10
+            )
+        return True
+
+automod = Automod()
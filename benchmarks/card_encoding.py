@@ -0,0 +1,52 @@
+"""Compare welcome card encode time and size across output formats.
+
+Renders one card offline (no network) and encodes it with every entry in
+welcome_card.CARD_FORMATS, plus the budgeted "auto" mode.
+
+Usage (from the repository root):
+    python -m benchmarks.card_encoding [--runs 20] [--budget-kb 200]
+"""
+import argparse
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+from welcome_card import CARD_FORMATS, ACCENT_COLOR, build_template, render_card, encode_card, encode_with
+
+def sample_card() -> Image.Image:
+    """A representative card with a synthetic avatar"""
+    avatar = Image.new('RGBA', (180, 180), (114, 137, 218))
+    ImageDraw.Draw(avatar).ellipse((40, 40, 140, 140), fill=(255, 200, 80))
+    template = build_template(ACCENT_COLOR)
+    return render_card(template, avatar, "BenchmarkUser", "Benchmark Server", 1234, ACCENT_COLOR,
+                       "Welcome BenchmarkUser to Benchmark Server!")
+
+def time_encode(encode, runs: int):
+    timings = []
+    size = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        buffer = encode()
+        timings.append((time.perf_counter() - started) * 1000)
+        size = buffer.getbuffer().nbytes
+    return statistics.median(timings), size, buffer.name
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--budget-kb", type=int, default=200)
+    args = parser.parse_args()
+    
+    card = sample_card()
+    print(f"{'format':<14}{'median ms':>12}{'size KB':>12}")
+    for fmt in CARD_FORMATS:
+        ms, size, _ = time_encode(lambda: encode_with(card, fmt), args.runs)
+        print(f"{fmt:<14}{ms:>12.1f}{size / 1024:>12.1f}")
+    
+    budget = args.budget_kb * 1024
+    ms, size, name = time_encode(lambda: encode_card(card, "auto", budget), args.runs)
+    print(f"{'auto':<14}{ms:>12.1f}{size / 1024:>12.1f}  -> {name} (budget {args.budget_kb} KB)")
+
+if __name__ == '__main__':
+    main()
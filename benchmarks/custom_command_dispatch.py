@@ -0,0 +1,110 @@
+"""What the in-process custom command path does to message dispatch.
+
+Feeds a synthetic message mix through main.send_message twice: once with no
+custom commands defined (every !name falls through to the "command not
+found" reply) and once with the guild's commands loaded, so the same
+messages are answered locally. get_response is replaced by a counting stub,
+so no service or network is needed. It counts calls for !-prefixed messages
+separately: those never reach the responder in either run (unknown commands
+get the "not found" reply), so the gain is local answers in place of error
+replies, not responder traffic saved.
+
+Usage (from the repository root):
+    python -m benchmarks.custom_command_dispatch [--messages 20000] [--commands 200] [--custom-share 0.2]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.fakes import FakeGuild, FakeMessage, isolated_workdir
+
+REPLY_PREFIX = "Reply for "
+
+def build_traffic(names, count: int, custom_share: float, rng: random.Random):
+    """Mix of chatter, !-prefixed custom commands and unknown commands"""
+    words = ["hello", "what's up", "lol", "anyone here?", "gg", "how do I join", "nice", "brb"]
+    traffic = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < custom_share:
+            traffic.append("!" + rng.choice(names))
+        elif roll < custom_share + 0.05:
+            traffic.append("!notacommand")
+        else:
+            traffic.append(rng.choice(words))
+    return traffic
+
+async def run(main, guild, traffic) -> dict:
+    calls = 0
+    command_calls = 0
+
+    async def counting_response(user_input: str, allow_lookup=None) -> str:
+        nonlocal calls, command_calls
+        calls += 1
+        if user_input.startswith("!"):
+            command_calls += 1
+        return "stub response"
+
+    main.get_response = counting_response
+    author = guild.members[0]
+    channel = guild.channels[0]
+    channel.sent.clear()
+
+    command_times = []
+    started = time.perf_counter()
+    for content in traffic:
+        sent_at = time.perf_counter()
+        await main.send_message(FakeMessage(content, author, channel), content)
+        if content.startswith("!"):
+            command_times.append(time.perf_counter() - sent_at)
+    elapsed = time.perf_counter() - started
+
+    replies = [sent.content or "" for sent in channel.sent]
+    return {
+        "responder_calls": calls,
+        "responder_command_calls": command_calls,
+        "not_found": sum(reply.startswith("Command `") for reply in replies),
+        "local_replies": sum(reply.startswith(REPLY_PREFIX) for reply in replies),
+        "us_per_message": elapsed / len(traffic) * 1e6,
+        "us_per_command": sum(command_times) / len(command_times) * 1e6 if command_times else 0.0,
+    }
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--commands", type=int, default=200)
+    parser.add_argument("--custom-share", type=float, default=0.2, help="fraction of messages invoking a custom command")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    isolated_workdir()
+    import main
+    main.print = lambda *a, **k: None  # on_message logging would dominate the timings
+
+    rng = random.Random(args.seed)
+    guild = FakeGuild()
+    guild.add_member("bench-user")
+    # One author sends every message, so give commands room to pass the cooldowns they still go through
+    main.guild_config.set(guild.id, "command_cooldowns", {"*": {"user": [args.messages, 60]}})
+    names = [f"cmd{i}" for i in range(args.commands)]
+    traffic = build_traffic(names, args.messages, args.custom_share, rng)
+
+    baseline = asyncio.run(run(main, guild, traffic))
+
+    for name in names:
+        main.custom_commands.add_command(str(guild.id), name, REPLY_PREFIX + "{user}: {random:a|b|c}", "0")
+    local = asyncio.run(run(main, guild, traffic))
+
+    print(f"messages:                  {len(traffic)}")
+    print(f"'not found' replies:       {baseline['not_found']} before, {local['not_found']} after")
+    print(f"answered locally:          {local['local_replies']} custom command replies")
+    print(f"responder calls:           {baseline['responder_calls']} before, {local['responder_calls']} after")
+    print(f"  for ! messages:          {baseline['responder_command_calls']} before, "
+          f"{local['responder_command_calls']} after")
+    print(f"! message cost, before:    {baseline['us_per_command']:.1f} us/message (suggestion + error reply)")
+    print(f"! message cost, after:     {local['us_per_command']:.1f} us/message")
+    print(f"overall dispatch cost:     {baseline['us_per_message']:.1f} -> {local['us_per_message']:.1f} us/message")
+
+if __name__ == '__main__':
+    main_cli()
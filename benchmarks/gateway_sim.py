@@ -0,0 +1,377 @@
+"""Offline gateway simulator: end-to-end throughput of the bot's event handlers.
+
+Feeds a synthetic stream of messages, member joins and reactions into
+main.on_message, main.on_member_join and main.on_raw_reaction_add, with
+fake guilds/channels that record what the bot sends. The response service
+runs in-process on a SQLite database through httpx's ASGI transport, so
+chatter takes the real get_response -> /respond path without a network.
+Avatar downloads for welcome cards are served from local fixtures.
+
+Reports sustained events/sec, per-event-type latency percentiles and
+memory growth sampled over the run. Any handler error fails the run (raise
+the allowance with --max-errors); pass thresholds to use it as a regression
+check as well, and it exits non-zero when any is exceeded. Automod is enabled
+with a couple of banned words that a small share of messages contain.
+
+Usage (from the repository root):
+    python -m benchmarks.gateway_sim [--events 20000 | --duration 300] [--concurrency 8]
+                                     [--mix message=0.85,join=0.05,reaction=0.10]
+                                     [--max-p95-ms 50] [--min-eps 200] [--max-growth-kb 2048] [--max-errors 0] [--json]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+from benchmarks.fakes import FakeGuild, FakeMessage, FakeReactionPayload, isolated_workdir
+
+EVENT_TYPES = ["message", "join", "reaction"]
+
+CHATTER = ["hello", "what's up", "lol", "anyone here?", "gg", "how do I join", "nice", "brb", "good morning"]
+COMMANDS = ["!ping", "!help", "!info", "!stats", "!poll Pizza tonight?"]
+
+# Automod runs on every message; a few messages hit a banned word and get deleted with a warning.
+# The threshold is out of reach so nobody is muted partway through the run.
+BANNED_WORDS = ["spamword", "scamlink"]
+BANNED_SHARE = 0.02
+BENCH_AUTOMOD = {"automod_enabled": True, "automod_banned_words": BANNED_WORDS, "automod_warn_threshold": 1_000_000}
+
+BENCH_COOLDOWNS = {
+    name: {"user": [100_000, 60], "guild": [1_000_000, 60]} for name in ("*", "!poll", "respond")
+}
+
+def current_rss_kb() -> Optional[float]:
+    """Resident set size right now (Linux), falling back to the peak elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 if sys.platform == "darwin" else peak
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {name: 0.0 for name in EVENT_TYPES}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in mix:
+            raise SystemExit(f"Unknown event type '{name}', expected one of {', '.join(EVENT_TYPES)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def growth_slope(samples: List[tuple]) -> float:
+    """Least-squares KB per 10k events over (events, rss_kb) samples"""
+    if len(samples) < 2:
+        return 0.0
+    xs = [events for events, _ in samples]
+    ys = [rss for _, rss in samples]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if var == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var * 10_000
+
+def seed_service(service, triggers: int) -> List[str]:
+    """Fill the SQLite stand-in with active triggers; returns them"""
+    # The ASGI transport doesn't run startup events, so create the schema ourselves
+    service.init_db()
+    phrases = [f"trigger phrase {i}" for i in range(triggers)]
+    db = service.SessionLocal()
+    try:
+        if db.query(service.ChatResponseModel).count() == 0:
+            db.add_all(service.ChatResponseModel(trigger=phrase, response=f"Response to {phrase}", active=True)
+                       for phrase in phrases)
+            db.commit()
+    finally:
+        db.close()
+    service.rebuild_snapshot()
+    return phrases
+
+class Simulator:
+    def __init__(self, main, guilds: List[FakeGuild], triggers: List[str], mix: Dict[str, float],
+                 rng: random.Random, member_pool: int):
+        self.main = main
+        self.guilds = guilds
+        self.triggers = triggers
+        self.rng = rng
+        self.member_pool = member_pool
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.channels = {channel.id: channel for guild in guilds for channel in guild.channels}
+        self.latencies: Dict[str, List[float]] = {name: [] for name in EVENT_TYPES}
+        self.errors = 0
+        self.sent = 0
+
+    def next_message(self) -> str:
+        roll = self.rng.random()
+        if roll < BANNED_SHARE:
+            return f"{self.rng.choice(CHATTER)} {self.rng.choice(BANNED_WORDS)}"
+        if roll < 0.4:
+            # A substring of a stored trigger, so /respond finds a match
+            return self.rng.choice(self.triggers)[:self.rng.randint(9, 16)]
+        if roll < 0.8:
+            return self.rng.choice(CHATTER)
+        return self.rng.choice(COMMANDS)
+
+    def make_event(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        guild = self.rng.choice(self.guilds)
+        channel = self.rng.choice(guild.channels)
+        member = self.rng.choice(guild.members)
+
+        if kind == "message":
+            content = self.next_message()
+            return kind, self.main.on_message, FakeMessage(content, member, channel)
+        if kind == "join":
+            joined = guild.add_member(f"newcomer{len(guild.members)}")
+            # Someone leaves for everyone who joins, so the member list stays a fixed size
+            if len(guild.members) > self.member_pool:
+                guild.members.pop(0)
+            return kind, self.main.on_member_join, joined
+        polls = list(self.main.active_polls)
+        message_id = self.rng.choice(polls) if polls and self.rng.random() < 0.8 else self.rng.randrange(1, 10**9)
+        return kind, self.main.on_raw_reaction_add, FakeReactionPayload(message_id, channel, member)
+
+    async def dispatch(self, kind: str, handler, argument) -> None:
+        started = time.perf_counter()
+        try:
+            await handler(argument)
+        except Exception:
+            self.errors += 1
+        self.latencies[kind].append((time.perf_counter() - started) * 1000)
+
+    def drain_sent(self) -> None:
+        """Forget recorded sends so the harness itself doesn't look like a leak"""
+        for channel in self.channels.values():
+            self.sent += len(channel.sent)
+            channel.sent.clear()
+        for guild in self.guilds:
+            for member in guild.members:
+                self.sent += len(member.dm.sent)
+                member.dm.sent.clear()
+
+    async def run(self, events: Optional[int], duration: Optional[float], concurrency: int,
+                  warmup: int, sample_every: int) -> dict:
+        semaphore = asyncio.Semaphore(concurrency)
+        pending = set()
+        samples: List[tuple] = []
+
+        async def bounded(kind, handler, argument):
+            try:
+                await self.dispatch(kind, handler, argument)
+            finally:
+                semaphore.release()
+
+        started = None
+        count = 0
+        deadline = None
+        while True:
+            if count == warmup and started is None:
+                # Let warmup work finish so caches and pools are populated before we start measuring
+                if pending:
+                    await asyncio.wait(pending)
+                for latencies in self.latencies.values():
+                    latencies.clear()
+                self.errors = 0
+                self.drain_sent()
+                self.sent = 0
+                gc.collect()
+                samples.append((0, current_rss_kb()))
+                started = time.perf_counter()
+                deadline = started + duration if duration else None
+            measured = count - warmup if started is not None else 0
+            if started is not None and ((events and measured >= events) or (deadline and time.perf_counter() >= deadline)):
+                break
+
+            await semaphore.acquire()
+            task = asyncio.ensure_future(bounded(*self.make_event()))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            count += 1
+
+            if started is not None and measured and measured % sample_every == 0:
+                self.drain_sent()
+                gc.collect()
+                samples.append((measured, current_rss_kb()))
+
+        if pending:
+            await asyncio.wait(pending)
+        elapsed = time.perf_counter() - started
+        measured = count - warmup
+        self.drain_sent()
+        gc.collect()
+        samples.append((measured, current_rss_kb()))
+
+        samples = [(n, rss) for n, rss in samples if rss is not None]
+        return {
+            "events": measured,
+            "seconds": elapsed,
+            "events_per_sec": measured / elapsed if elapsed else 0.0,
+            "errors": self.errors,
+            "sends": self.sent,
+            "latency_ms": {
+                kind: {
+                    "count": len(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99),
+                    "max": max(values) if values else 0.0,
+                }
+                for kind, values in self.latencies.items()
+            },
+            "rss_start_kb": samples[0][1] if samples else None,
+            "rss_end_kb": samples[-1][1] if samples else None,
+            "rss_growth_kb": samples[-1][1] - samples[0][1] if samples else None,
+            "rss_kb_per_10k_events": growth_slope(samples),
+        }
+
+def install_fixture_downloads(wc) -> None:
+    """Serve avatar/background downloads from the render benchmark's local fixtures"""
+    from benchmarks.welcome_card_render import ensure_fixtures, load_fixture
+
+    ensure_fixtures()
+    avatar = load_fixture("avatar.png")
+
+    async def fixture_download(url: str, max_bytes: int = wc.DOWNLOAD_MAX_BYTES) -> Optional[bytes]:
+        return avatar
+
+    wc.download_image = fixture_download
+
+def build_guilds(count: int, channels: int, members: int) -> List[FakeGuild]:
+    guilds = []
+    for g in range(count):
+        guild = FakeGuild(name=f"Sim Server {g}", channels=channels)
+        for m in range(members):
+            guild.add_member(f"member{m}")
+        guilds.append(guild)
+    return guilds
+
+async def simulate(args, main, service, responses) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=service.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://service") as client:
+        responses.set_client(client)
+        try:
+            rng = random.Random(args.seed)
+            triggers = seed_service(service, args.triggers)
+            guilds = build_guilds(args.guilds, args.channels, args.members)
+            # Synthetic authors post far faster than the default cooldowns allow; generous limits keep
+            # every command and chat reply going through the limiter without turning traffic away
+            for guild in guilds:
+                main.guild_config.set(guild.id, "command_cooldowns", BENCH_COOLDOWNS)
+                for key, value in BENCH_AUTOMOD.items():
+                    main.guild_config.set(guild.id, key, value)
+            simulator = Simulator(main, guilds, triggers, parse_mix(args.mix), rng, args.members)
+            # Reactions look their channel up on the client; route that to the fakes
+            main.client.get_channel = simulator.channels.get
+            if args.prefilter:
+                await responses.prefilter.refresh()
+            else:
+                responses.prefilter.filter = None
+            result = await simulator.run(args.events if not args.duration else None, args.duration,
+                                       args.concurrency, args.warmup, args.sample_every)
+            result["responder_skipped"] = responses.prefilter.skipped
+            result["responder_passed"] = responses.prefilter.passed
+            return result
+        finally:
+            responses.set_client(None)
+
+def report(result: dict) -> None:
+    print(f"events:            {result['events']} in {result['seconds']:.1f}s "
+          f"({result['events_per_sec']:.0f} events/sec, {result['errors']} handler errors, {result['sends']} sends)")
+    print(f"{'event':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, stats in result["latency_ms"].items():
+        if stats["count"]:
+            print(f"{kind:<10}{stats['count']:>8}{stats['p50']:>10.2f}{stats['p95']:>10.2f}"
+                  f"{stats['p99']:>10.2f}{stats['max']:>10.2f}")
+    checked = result["responder_skipped"] + result["responder_passed"]
+    if checked:
+        print(f"prefilter:         {result['responder_skipped']} of {checked} responder lookups skipped locally")
+    if result["rss_start_kb"] is not None:
+        print(f"rss:               {result['rss_start_kb'] / 1024:.1f} MB -> {result['rss_end_kb'] / 1024:.1f} MB "
+              f"({result['rss_growth_kb']:+.0f} KB, {result['rss_kb_per_10k_events']:+.1f} KB per 10k events)")
+
+def check_thresholds(result: dict, args) -> List[str]:
+    failures = []
+    if args.min_eps is not None and result["events_per_sec"] < args.min_eps:
+        failures.append(f"throughput {result['events_per_sec']:.0f} events/sec < {args.min_eps}")
+    if args.max_p95_ms is not None:
+        for kind, stats in result["latency_ms"].items():
+            if stats["count"] and stats["p95"] > args.max_p95_ms:
+                failures.append(f"{kind} p95 {stats['p95']:.2f} ms > {args.max_p95_ms}")
+    if args.max_growth_kb is not None and result["rss_growth_kb"] is not None \
+            and result["rss_growth_kb"] > args.max_growth_kb:
+        failures.append(f"memory growth {result['rss_growth_kb']:.0f} KB > {args.max_growth_kb}")
+    if result["errors"] > args.max_errors:
+        failures.append(f"{result['errors']} handler errors > {args.max_errors}")
+    return failures
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="measured events (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="run for this many seconds instead of a fixed event count")
+    parser.add_argument("--warmup", type=int, default=500, help="events before measuring starts")
+    parser.add_argument("--concurrency", type=int, default=8, help="events in flight at once")
+    parser.add_argument("--mix", default="message=0.85,join=0.05,reaction=0.10")
+    parser.add_argument("--guilds", type=int, default=5)
+    parser.add_argument("--channels", type=int, default=3, help="channels per guild")
+    parser.add_argument("--members", type=int, default=200, help="members per guild")
+    parser.add_argument("--triggers", type=int, default=500, help="rows in the response service")
+    parser.add_argument("--sample-every", type=int, default=2000, help="events between memory samples")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-prefilter", dest="prefilter", action="store_false",
+                        help="send every chat message to the service instead of using the trigger prefilter")
+    parser.add_argument("--min-eps", type=float, help="fail below this many events/sec")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if any event type's p95 latency exceeds this")
+    parser.add_argument("--max-growth-kb", type=float, help="fail if RSS grows more than this over the run")
+    parser.add_argument("--max-errors", type=int, default=0, help="fail if more handlers raise than this (default: any error fails)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    workdir = isolated_workdir()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'responses.db')}"
+
+    import main
+    import responses
+    import service
+    import welcome_card
+
+    # Per-message logging would dominate the timings
+    main.print = lambda *a, **k: None
+    responses.print = lambda *a, **k: None
+    install_fixture_downloads(welcome_card)
+
+    try:
+        result = asyncio.run(simulate(args, main, service, responses))
+    finally:
+        welcome_card.renderer.shutdown()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        report(result)
+
+    failures = check_thresholds(result, args)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
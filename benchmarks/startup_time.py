@@ -0,0 +1,68 @@
+"""Cold import time of the bot and the response service.
+
+Each measurement is a fresh interpreter importing the module from a scratch
+directory, so nothing is cached in-process between runs. Also reports
+which heavy modules the import pulled in, to catch accidental eager
+imports (the welcome card renderer should only load on first use).
+
+Usage (from the repository root):
+    python -m benchmarks.startup_time [--runs 5] [--max-ms 1500]
+
+Exits non-zero when a median import time exceeds --max-ms.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should not be loaded just by importing the target
+HEAVY_MODULES = ["welcome_card", "PIL"]
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(module: str, workdir: str, env: dict) -> dict:
+    code = PROBE.format(root=REPO_ROOT, module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main_cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", default="main,service")
+    parser.add_argument("--max-ms", type=float, help="fail if a median import takes longer than this")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bot-startup-")
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'responses.db')}")
+
+    failures = 0
+    print(f"{'module':<10}{'median ms':>11}{'min ms':>9}{'max ms':>9}  heavy modules loaded")
+    for module in args.modules.split(","):
+        results = [measure(module, workdir, env) for _ in range(args.runs)]
+        times = [result["ms"] for result in results]
+        median = statistics.median(times)
+        loaded = ", ".join(results[-1]["loaded"]) or "none"
+        print(f"{module:<10}{median:>11.1f}{min(times):>9.1f}{max(times):>9.1f}  {loaded}")
+        if args.max_ms is not None and median > args.max_ms:
+            failures += 1
+
+    created = sorted(os.listdir(workdir))
+    print(f"\nFiles created by importing: {', '.join(created) or 'none'}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,259 @@
+"""Welcome card render benchmark and golden-image regression check.
+
+Renders cards offline from local fixture avatars and backgrounds (no
+network) across username lengths, fonts and background options, and
+reports per-stage timings (download, compose, text, encode) plus peak
+memory. Every rendered card is compared against a golden image with a
+perceptual tolerance so optimizations can't silently change the look.
+
+Fixtures are generated deterministically into benchmarks/fixtures/ on first
+run. Golden images live in benchmarks/golden/; create or refresh them after
+an intentional visual change with --update-golden.
+
+Usage (from the repository root):
+    python -m benchmarks.welcome_card_render [--runs 10] [--fonts default,poppins]
+                                             [--tolerance 1.5] [--update-golden]
+
+Exits non-zero when a card drifts from its golden image or has none, so it
+can be used in regression checks.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+import welcome_card as wc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures")
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+
+USERNAMES = {
+    "short": "Al",
+    "medium": "MediumLengthName",
+    "long": "AVeryLongUsernameThatShrinks_1234",
+}
+
+BACKGROUNDS = {
+    "none": None,
+    "landscape": (1920, 1080),
+    "portrait": (800, 1400),
+}
+
+FONTS = {
+    "default": (None, None),
+    "poppins": ("assets/fonts/Poppins-Regular.ttf", "assets/fonts/Poppins-Bold.ttf"),
+}
+
+STAGES = ["download", "compose", "text", "encode"]
+
+def fixture_path(name: str) -> str:
+    return os.path.join(FIXTURE_DIR, name)
+
+def ensure_fixtures() -> None:
+    """Generate deterministic avatar and background fixtures if missing"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+    avatar_path = fixture_path("avatar.png")
+    if not os.path.exists(avatar_path):
+        avatar = Image.new('RGBA', (256, 256), (114, 137, 218, 255))
+        draw = ImageDraw.Draw(avatar)
+        draw.ellipse((48, 48, 208, 208), fill=(255, 200, 80, 255))
+        draw.rectangle((96, 140, 160, 160), fill=(35, 39, 42, 255))
+        avatar.save(avatar_path, format="PNG")
+
+    for name, size in BACKGROUNDS.items():
+        if size is None:
+            continue
+        path = fixture_path(f"background_{name}.png")
+        if os.path.exists(path):
+            continue
+        # Diagonal color ramp with stripes so blur and crop differences show up
+        width, height = size
+        ramp = Image.linear_gradient('L').resize(size)
+        background = Image.merge('RGB', (ramp, ramp.rotate(90).resize(size), Image.new('L', size, 128)))
+        draw = ImageDraw.Draw(background)
+        for x in range(0, width, 80):
+            draw.line([(x, 0), (x + height // 2, height)], fill=(240, 240, 240), width=6)
+        background.save(path, format="PNG")
+
+def load_fixture(name: str) -> bytes:
+    """Stands in for download_image: reads fixture bytes from disk"""
+    with open(fixture_path(name), 'rb') as f:
+        return f.read()
+
+def use_fonts(font: str) -> bool:
+    """Point the card module at a font set; False if the fonts aren't installed"""
+    regular, bold = FONTS[font]
+    if regular and not (os.path.exists(regular) and os.path.exists(bold)):
+        return False
+    wc.FONT_REGULAR, wc.FONT_BOLD = regular, bold
+    wc.load_font.cache_clear()
+    wc.template_cache.clear()
+    return True
+
+# Time spent in the instrumented stages of the last render, and the card handed to the encoder
+_stage_times: Dict[str, float] = {}
+_last_card: List[Image.Image] = []
+
+def _timed(stage: str, func):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _stage_times[stage] = _stage_times.get(stage, 0.0) + time.perf_counter() - started
+    return wrapper
+
+def instrument() -> None:
+    """Time the text and encode stages inside the real render path, and keep the card being encoded"""
+    if getattr(wc.encode_card, "benchmark_wrapped", False):
+        return
+    encode = wc.encode_card
+
+    def capture_and_encode(card, *args, **kwargs):
+        _last_card[:] = [card]
+        return encode(card, *args, **kwargs)
+
+    wc.draw_member_text = _timed("text", wc.draw_member_text)
+    wc.encode_card = _timed("encode", capture_and_encode)
+    wc.encode_card.benchmark_wrapped = True
+
+def use_scratch_image_cache() -> None:
+    """Keep the disk tier of the image caches out of the repository"""
+    directory = tempfile.mkdtemp(prefix="card-bench-cache-")
+    wc.avatar_cache.directory = os.path.join(directory, "avatars")
+    wc.background_cache.directory = os.path.join(directory, "backgrounds")
+    for cache in (wc.avatar_cache, wc.background_cache):
+        os.makedirs(cache.directory, exist_ok=True)
+
+def clear_caches() -> None:
+    wc.template_cache.clear()
+    for cache in (wc.avatar_cache, wc.background_cache):
+        with cache.lock:
+            cache.images.clear()
+            cache.disk_files = None
+        for name in os.listdir(cache.directory):
+            os.remove(os.path.join(cache.directory, name))
+
+def render_once(username: str, background: Optional[str], cold: bool) -> Tuple[Dict[str, float], Image.Image]:
+    """Render one card through welcome_card.render_welcome_card, returning per-stage timings in ms and the card.
+
+    Like create_welcome_card, image bytes are only "downloaded" (read from the
+    fixtures) when the caches don't already hold them.
+    """
+    if cold:
+        clear_caches()
+    avatar_key = "benchmark-avatar"
+    background_key = f"benchmark-{background}" if background else None
+    template_key = ("benchmark", wc.ACCENT_COLOR, background)
+
+    started = time.perf_counter()
+    avatar_data = None if wc.avatar_cache.has(avatar_key) else load_fixture("avatar.png")
+    bg_data = None
+    if background_key and template_key not in wc.template_cache and not wc.background_cache.has(background_key):
+        bg_data = load_fixture(f"background_{background}.png")
+    download = time.perf_counter() - started
+
+    _stage_times.clear()
+    started = time.perf_counter()
+    wc.render_welcome_card(template_key, avatar_key, avatar_data, username, "Benchmark Server", 1234,
+                           wc.ACCENT_COLOR, None, background_key, bg_data)
+    total = time.perf_counter() - started
+
+    text, encode = _stage_times.get("text", 0.0), _stage_times.get("encode", 0.0)
+    timings = {"download": download, "compose": total - text - encode, "text": text, "encode": encode}
+    return {stage: seconds * 1000 for stage, seconds in timings.items()}, _last_card[0]
+
+def perceptual_diff(actual: Image.Image, expected: Image.Image) -> float:
+    """Mean absolute luminance difference (0-255) after a box downscale.
+
+    Downscaling averages away anti-aliasing and resampling noise so only
+    visible changes (layout, color, missing layers) move the score.
+    """
+    if actual.size != expected.size:
+        return 255.0
+    size = (wc.CARD_WIDTH // 4, wc.CARD_HEIGHT // 4)
+    a = actual.convert('L').resize(size, Image.BOX)
+    b = expected.convert('L').resize(size, Image.BOX)
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0]
+
+def check_golden(name: str, card: Image.Image, tolerance: float, update: bool) -> str:
+    path = os.path.join(GOLDEN_DIR, f"{name}.png")
+    if update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        card.save(path, format="PNG", optimize=True)
+        return "updated"
+    if not os.path.exists(path):
+        # A card with nothing to compare against is a failure, or the check could never fail
+        return "FAIL (no golden, run with --update-golden)"
+    with Image.open(path) as golden:
+        diff = perceptual_diff(card, golden)
+    return f"ok ({diff:.2f})" if diff <= tolerance else f"FAIL ({diff:.2f})"
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="warm renders per scenario")
+    parser.add_argument("--fonts", default=",".join(FONTS), help="comma separated font sets")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="max mean luminance difference")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite golden images")
+    args = parser.parse_args()
+
+    ensure_fixtures()
+    instrument()
+    use_scratch_image_cache()
+    failures = 0
+    header = f"{'scenario':<28}{'mode':<6}" + "".join(f"{stage + ' ms':>13}" for stage in STAGES)
+    print(header + f"{'total ms':>11}{'py peak KB':>12}  golden")
+
+    for font in args.fonts.split(","):
+        if not use_fonts(font):
+            print(f"Skipping font set '{font}': font files not found")
+            continue
+        for background in BACKGROUNDS:
+            for length, username in USERNAMES.items():
+                name = f"{font}-{background}-{length}"
+                bg = background if BACKGROUNDS[background] else None
+
+                tracemalloc.start()
+                cold, card = render_once(username, bg, cold=True)
+                _, py_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                warm_runs: List[Dict[str, float]] = [render_once(username, bg, cold=False)[0] for _ in range(args.runs)]
+                warm = {stage: statistics.median(run[stage] for run in warm_runs) for stage in STAGES}
+
+                golden = check_golden(name, card, args.tolerance, args.update_golden)
+                failures += golden.startswith("FAIL")
+
+                for mode, timings in (("cold", cold), ("warm", warm)):
+                    row = f"{name:<28}{mode:<6}" + "".join(f"{timings[stage]:>13.2f}" for stage in STAGES)
+                    row += f"{sum(timings.values()):>11.2f}"
+                    row += f"{py_peak / 1024:>12.0f}  {golden}" if mode == "cold" else ""
+                    print(row)
+
+    rss = peak_rss_mb()
+    if rss is not None:
+        print(f"\nPeak process RSS: {rss:.1f} MB")
+    if failures:
+        print(f"{failures} card(s) differ from or have no golden image")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
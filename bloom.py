@@ -0,0 +1,89 @@
+"""Bloom filter of trigger n-grams, shared by the service (which builds it) and the bot (which checks it).
+
+/respond matches when the input is a substring of a trigger. Every 3-gram
+of a substring is a 3-gram of the trigger it came from, so an input with a
+3-gram that no trigger contains can never match. Inputs shorter than three
+characters are checked by their 1- or 2-gram instead, and anything longer
+than the longest trigger is ruled out outright. False positives only cost
+a service call; there are no false negatives.
+"""
+import hashlib
+import math
+import struct
+from typing import Iterable, Set
+
+MAGIC = b"BLM1"
+HEADER = struct.Struct("<4sIII")  # magic, size in bits, hash count, longest trigger length
+GRAM_SIZE = 3
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings, hashed with blake2b and double hashing"""
+    __slots__ = ("size", "hashes", "bits", "max_length")
+
+    def __init__(self, size: int, hashes: int, bits: bytes = None, max_length: int = 0):
+        self.size = max(size, 8)
+        self.hashes = max(hashes, 1)
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+        self.max_length = max_length
+
+    @classmethod
+    def for_capacity(cls, count: int, fp_rate: float) -> "BloomFilter":
+        """Smallest filter holding count items at roughly fp_rate false positives"""
+        count = max(count, 1)
+        fp_rate = min(max(fp_rate, 1e-6), 0.5)
+        size = math.ceil(-count * math.log(fp_rate) / (math.log(2) ** 2))
+        hashes = round(size / count * math.log(2))
+        return cls(size, hashes)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_bytes(self) -> bytes:
+        return HEADER.pack(MAGIC, self.size, self.hashes, self.max_length) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BloomFilter":
+        magic, size, hashes, max_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or len(data) - HEADER.size != (size + 7) // 8:
+            raise ValueError("Not a serialized Bloom filter")
+        return cls(size, hashes, data[HEADER.size:], max_length)
+
+def trigger_grams(text: str) -> Set[str]:
+    """Every 1-, 2- and 3-gram of a lowercased trigger"""
+    grams = set()
+    for n in range(1, GRAM_SIZE + 1):
+        grams.update(text[i:i + n] for i in range(len(text) - n + 1))
+    return grams
+
+def build_trigger_filter(triggers: Iterable[str], fp_rate: float = 0.01) -> BloomFilter:
+    grams: Set[str] = set()
+    max_length = 0
+    for trigger in triggers:
+        trigger = trigger.lower()
+        grams.update(trigger_grams(trigger))
+        max_length = max(max_length, len(trigger))
+
+    bloom = BloomFilter.for_capacity(len(grams), fp_rate)
+    bloom.max_length = max_length
+    for gram in grams:
+        bloom.add(gram)
+    return bloom
+
+def could_match(bloom: BloomFilter, text: str) -> bool:
+    """False only if text (already lowercased) is certainly not a substring of any trigger"""
+    if len(text) > bloom.max_length:
+        return False
+    if len(text) < GRAM_SIZE:
+        return not text or text in bloom
+    return all(text[i:i + GRAM_SIZE] in bloom for i in range(len(text) - GRAM_SIZE + 1))
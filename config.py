@@ -1,96 +1,277 @@
-import json
-import os
-from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Callable, Iterator, Mapping
+from config_storage import ConfigBackend, GuildUpdate, create_backend
+
+# Default configuration
+DEFAULTS: Dict[str, Any] = {
+    "prefix": "!",
+    "welcome_enabled": True,
+    "welcome_message": "Welcome {user} to {server}!",
+    "welcome_channel": None,
+    "welcome_card_format": "png",
+    "welcome_card_max_bytes": None,
+    "log_enabled": False,
+    "log_channel": None,
+    "automod_enabled": False,
+    "automod_banned_words": [],
+    "automod_warn_threshold": 3,
+    "automod_mute_minutes": 10,
+    # command -> {"user": [uses, seconds], "guild": [uses, seconds]}; unset commands use ratelimit.DEFAULT_COOLDOWNS
+    "command_cooldowns": {},
+}
+
+def _migrate_channel_ids(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """v1: channel IDs are stored as strings (older configs stored ints)"""
+    for key in ("welcome_channel", "log_channel"):
+        if isinstance(settings.get(key), int):
+            settings[key] = str(settings[key])
+    return settings
+
+def _migrate_banned_words(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """v2: banned words are a lowercase, de-duplicated list rather than a comma separated string"""
+    words = settings.get("automod_banned_words")
+    if words is None:
+        return settings
+    if isinstance(words, str):
+        words = words.split(",")
+    seen = []
+    for word in (w.strip().lower() for w in words):
+        if word and word not in seen:
+            seen.append(word)
+    settings["automod_banned_words"] = seen
+    return settings
+
+# Schema migrations, applied in order once at load; the stored schema version is their count
+MIGRATIONS: List[Callable[[Dict[str, Any]], Dict[str, Any]]] = [
+    _migrate_channel_ids,
+    _migrate_banned_words,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def _freeze(value: Any) -> Any:
+    """Read-only copy of a setting: lists become tuples and dicts become mapping proxies"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+def _thaw(value: Any) -> Any:
+    """Plain, caller-owned copy of a frozen setting"""
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+class GuildSettings:
+    """Resolved, read-only settings for one guild (defaults merged with overrides)"""
+    __slots__ = tuple(DEFAULTS) + ("_extras",)
+
+    def __init__(self, overrides: Dict[str, Any]):
+        # Values are frozen copies, so neither a cached view nor DEFAULTS can be mutated through another
+        for key, default in DEFAULTS.items():
+            object.__setattr__(self, key, _freeze(overrides.get(key, default)))
+        object.__setattr__(self, "_extras", {k: _freeze(v) for k, v in overrides.items() if k not in DEFAULTS})
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        raise AttributeError("GuildSettings is read-only; use GuildConfig.set")
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dict of every setting, in the shape get_all has always returned (lists and dicts are copies)"""
+        result = {key: _thaw(getattr(self, key)) for key in DEFAULTS}
+        result.update((key, _thaw(value)) for key, value in self._extras.items())
+        return result
+
+class ConfigTransaction:
+    """Collects sets and resets across guilds and applies them with a single persist"""
+
+    def __init__(self, config: "GuildConfig"):
+        self.config = config
+        # guild_id -> [changes, removed keys, clear first]
+        self.updates: Dict[str, list] = {}
+
+    def _update(self, guild_id: str) -> list:
+        return self.updates.setdefault(str(guild_id), [{}, set(), False])
+
+    def set(self, guild_id: str, key: str, value: Any) -> None:
+        changes, removed, _ = self._update(guild_id)
+        changes[key] = value
+        removed.discard(key)
+
+    def reset(self, guild_id: str, key: Optional[str] = None) -> None:
+        update = self._update(guild_id)
+        if key:
+            update[0].pop(key, None)
+            update[1].add(key)
+        else:
+            self.updates[str(guild_id)] = [{}, set(), True]
+
+    def commit(self) -> None:
+        """Apply every queued change in memory, then persist them as one unit"""
+        batch: List[GuildUpdate] = []
+        for guild_id, (changes, removed, clear) in self.updates.items():
+            current = self.config.config.get(guild_id, {})
+            if clear:
+                current = {}
+            current = {k: v for k, v in current.items() if k not in removed}
+            current.update(changes)
+
+            if current:
+                self.config.config[guild_id] = current
+            else:
+                self.config.config.pop(guild_id, None)
+            self.config.views.pop(guild_id, None)
+            batch.append((guild_id, changes, sorted(removed), clear))
+
+        if batch:
+            self.config.persist(batch)
+        self.updates = {}
 
 class GuildConfig:
     """Configuration manager for guild-specific settings"""
-    
-    def __init__(self, data_file: str = "guild_config.json"):
+
+    def __init__(self, data_file: str = "guild_config.json", backend: Optional[ConfigBackend] = None):
         """Initialize the configuration manager"""
         self.data_file = data_file
-        self.config: Dict[str, Dict[str, Any]] = {}
-        self.load_config()
-        
-        # Default configuration
-        self.defaults = {
-            "prefix": "!",
-            "welcome_enabled": True,
-            "welcome_message": "Welcome {user} to {server}!",
-            "welcome_channel": None,
-            "log_enabled": False,
-            "log_channel": None,
-            "automod_enabled": False,
-            "automod_banned_words": [],
-            "automod_warn_threshold": 3,
-            "automod_mute_minutes": 10,
-        }
-    
+        self.backend = backend or create_backend(data_file)
+        self._config: Optional[Dict[str, Dict[str, Any]]] = None
+        # Resolved settings per guild, dropped whenever that guild changes
+        self.views: Dict[str, GuildSettings] = {}
+        self.defaults = dict(DEFAULTS)
+        self.default_view = GuildSettings({})
+        # Schema version still to be stored; a fresh install records it with its first real write
+        self.pending_schema_version: Optional[int] = None
+
+    @property
+    def config(self) -> Dict[str, Dict[str, Any]]:
+        """Stored settings per guild, loaded (and migrated) on first use so importing the bot touches no files"""
+        if self._config is None:
+            self.load_config()
+        return self._config
+
+    @config.setter
+    def config(self, value: Dict[str, Dict[str, Any]]) -> None:
+        self._config = value
+
     def load_config(self) -> None:
-        """Load configuration from the data file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    self.config = json.load(f)
-            except Exception as e:
-                print(f"Error loading configuration: {str(e)}")
-                self.config = {}
-    
+        """Load configuration from the storage backend"""
+        self._config = self.backend.load()
+        self.views.clear()
+        self.migrate()
+
+    def migrate(self) -> None:
+        """Bring stored settings up to SCHEMA_VERSION; runs once per version bump"""
+        version = self.backend.get_schema_version()
+        if version >= SCHEMA_VERSION:
+            return
+        if not self.config:
+            # Nothing stored yet, so nothing to migrate and no reason to write a file just for the version
+            self.pending_schema_version = SCHEMA_VERSION
+            return
+
+        with self.transaction() as txn:
+            for guild_id, settings in self.config.items():
+                migrated = dict(settings)
+                for migration in MIGRATIONS[version:]:
+                    migrated = migration(migrated)
+                for key, value in migrated.items():
+                    if settings.get(key) != value:
+                        txn.set(guild_id, key, value)
+                for key in set(settings) - set(migrated):
+                    txn.reset(guild_id, key)
+
+        self.backend.set_schema_version(SCHEMA_VERSION)
+        print(f"Migrated guild configuration from schema v{version} to v{SCHEMA_VERSION}")
+
+    def persist(self, updates: List[GuildUpdate]) -> None:
+        """Hand changes to the backend, storing a pending schema version along with them"""
+        if self.pending_schema_version is not None:
+            self.backend.set_schema_version(self.pending_schema_version)
+            self.pending_schema_version = None
+        self.backend.write_many(updates)
+
+    @contextmanager
+    def transaction(self) -> Iterator[ConfigTransaction]:
+        """Group several sets/resets into one atomic update with a single persist.
+
+        Nothing is applied if the block raises.
+        """
+        txn = ConfigTransaction(self)
+        yield txn
+        txn.commit()
+
     def save_config(self) -> None:
-        """Save configuration to the data file"""
-        try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.config, f, indent=4)
-        except Exception as e:
-            print(f"Error saving configuration: {str(e)}")
-    
+        """Flush any buffered configuration writes to storage"""
+        self.backend.flush()
+
+    def view(self, guild_id: str) -> GuildSettings:
+        """Get the cached, resolved settings for a guild"""
+        guild_id = str(guild_id)
+        settings = self.views.get(guild_id)
+        if settings is None:
+            overrides = self.config.get(guild_id)
+            settings = GuildSettings(overrides) if overrides else self.default_view
+            self.views[guild_id] = settings
+        return settings
+
     def get(self, guild_id: str, key: str) -> Any:
         """Get a configuration value for a guild"""
-        # Convert guild_id to string for JSON compatibility
-        guild_id = str(guild_id)
-        
-        if guild_id not in self.config:
-            # Initialize with defaults if guild has no config
-            return self.defaults.get(key)
-            
-        return self.config[guild_id].get(key, self.defaults.get(key))
-    
+        settings = self.view(guild_id)
+        if key in DEFAULTS:
+            return _thaw(getattr(settings, key))
+        return _thaw(settings._extras.get(key))
+
     def set(self, guild_id: str, key: str, value: Any) -> None:
         """Set a configuration value for a guild"""
         # Convert guild_id to string for JSON compatibility
         guild_id = str(guild_id)
-        
+
         if guild_id not in self.config:
             self.config[guild_id] = {}
-            
+
         self.config[guild_id][key] = value
-        self.save_config()
-    
+        self.views.pop(guild_id, None)
+        self.persist([(guild_id, {key: value}, (), False)])
+
     def get_all(self, guild_id: str) -> Dict[str, Any]:
         """Get all configuration values for a guild"""
-        # Convert guild_id to string for JSON compatibility
-        guild_id = str(guild_id)
-        
-        result = self.defaults.copy()
-        if guild_id in self.config:
-            # Override defaults with guild-specific settings
-            result.update(self.config[guild_id])
-            
-        return result
-        
+        return self.view(guild_id).as_dict()
+
     def reset(self, guild_id: str, key: Optional[str] = None) -> None:
         """Reset configuration for a guild"""
         # Convert guild_id to string for JSON compatibility
         guild_id = str(guild_id)
-        
+
         if guild_id not in self.config:
             return
-            
+
         if key:
             # Reset only the specified key
-            if key in self.config[guild_id]:
-                del self.config[guild_id][key]
+            if key not in self.config[guild_id]:
+                return
+            del self.config[guild_id][key]
+            self.persist([(guild_id, {}, [key], False)])
         else:
             # Reset all configuration for the guild
             del self.config[guild_id]
-            
-        self.save_config()
+            self.persist([(guild_id, {}, (), True)])
+        self.views.pop(guild_id, None)
+
+    def refresh(self) -> List[str]:
+        """Pick up external edits to the storage, returns the guild IDs that changed.
+
+        Only guilds whose stored settings actually differ have their cached
+        views dropped; everything else stays warm.
+        """
+        if not self.backend.changed():
+            return []
+
+        latest = self.backend.load()
+        changed = [guild_id for guild_id in set(self.config) | set(latest)
+                   if self.config.get(guild_id) != latest.get(guild_id)]
+        self.config = latest
+        for guild_id in changed:
+            self.views.pop(guild_id, None)
+        return changed
@@ -0,0 +1,272 @@
+import atexit
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, Any, Iterable, Optional, List, Tuple
+
+# One guild's pending change: (changed keys, removed keys, clear the guild first)
+GuildUpdate = Tuple[str, Dict[str, Any], Iterable[str], bool]
+
+class ConfigBackend:
+    """Persistence backend for GuildConfig.
+
+    Backends keep their own copy of the data; GuildConfig tells them what
+    changed and they decide how (and when) to write it.
+    """
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Return every guild's stored settings"""
+        raise NotImplementedError
+
+    def write(self, guild_id: str, changes: Dict[str, Any], removed: Iterable[str] = (), clear: bool = False) -> None:
+        """Persist changed keys for one guild; ``clear`` drops the guild entirely first"""
+        raise NotImplementedError
+
+    def write_many(self, updates: List[GuildUpdate]) -> None:
+        """Persist changes for several guilds as one unit"""
+        for guild_id, changes, removed, clear in updates:
+            self.write(guild_id, changes, removed, clear)
+
+    def get_schema_version(self) -> int:
+        return 0
+
+    def set_schema_version(self, version: int) -> None:
+        raise NotImplementedError
+
+    def flush(self) -> None:
+        """Force any buffered writes to storage"""
+
+    def changed(self) -> bool:
+        """True if the storage was modified by someone else since we last loaded or wrote it"""
+        return False
+
+    def close(self) -> None:
+        self.flush()
+
+class JsonConfigBackend(ConfigBackend):
+    """Single JSON file with write-behind debouncing and atomic replace.
+
+    Changes are applied in memory and the file is rewritten at most once per
+    ``delay`` seconds, via a temp file and rename so a crash never leaves a
+    half-written config behind.
+    """
+
+    def __init__(self, data_file: str = "guild_config.json", delay: float = 2.0):
+        self.data_file = data_file
+        self.delay = delay
+        self.data: Dict[str, Dict[str, Any]] = {}
+        # Stored under "_meta" in the file, never exposed as a guild
+        self.meta: Dict[str, Any] = {}
+        self.dirty = False
+        self.timer: Optional[threading.Timer] = None
+        self.lock = threading.Lock()
+        # Serializes file writes so an older payload can never replace a newer one
+        self.write_lock = threading.Lock()
+        # (mtime, size) of the file as we last read or wrote it
+        self.signature: Optional[tuple] = None
+        atexit.register(self.flush)
+
+    def _stat(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.data_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            self.signature = self._stat()
+            if os.path.exists(self.data_file):
+                try:
+                    with open(self.data_file, 'r') as f:
+                        self.data = json.load(f)
+                except Exception as e:
+                    print(f"Error loading configuration: {str(e)}")
+                    self.data = {}
+            self.meta = self.data.pop("_meta", {})
+            return copy.deepcopy(self.data)
+
+    def changed(self) -> bool:
+        # Our own pending write will replace the file anyway
+        with self.lock:
+            return not self.dirty and self._stat() != self.signature
+
+    def write(self, guild_id: str, changes: Dict[str, Any], removed: Iterable[str] = (), clear: bool = False) -> None:
+        self.write_many([(guild_id, changes, removed, clear)])
+
+    def write_many(self, updates: List[GuildUpdate]) -> None:
+        with self.lock:
+            for guild_id, changes, removed, clear in updates:
+                if clear:
+                    self.data.pop(guild_id, None)
+                if changes:
+                    self.data.setdefault(guild_id, {}).update(copy.deepcopy(changes))
+                guild = self.data.get(guild_id)
+                if guild is not None:
+                    for key in removed:
+                        guild.pop(key, None)
+            self._mark_dirty()
+
+    def _mark_dirty(self) -> None:
+        self.dirty = True
+        if self.timer is None:
+            self.timer = threading.Timer(self.delay, self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def get_schema_version(self) -> int:
+        return self.meta.get("schema_version", 0)
+
+    def set_schema_version(self, version: int) -> None:
+        with self.lock:
+            self.meta["schema_version"] = version
+            self._mark_dirty()
+
+    def flush(self) -> None:
+        with self.write_lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.dirty:
+                return
+            payload = json.dumps(dict(self.data, _meta=self.meta), separators=(',', ':'))
+            self.dirty = False
+
+        directory = os.path.dirname(os.path.abspath(self.data_file))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=".guild_config.", suffix=".tmp", dir=directory)
+            with os.fdopen(fd, 'w') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.data_file)
+            with self.lock:
+                self.signature = self._stat()
+        except Exception as e:
+            print(f"Error saving configuration: {str(e)}")
+            with self.lock:
+                self.dirty = True
+
+class SqliteConfigBackend(ConfigBackend):
+    """SQLite table keyed by (guild, key) so each change is a row-level write"""
+
+    def __init__(self, db_file: str = "guild_config.db", legacy_json: Optional[str] = "guild_config.json"):
+        self.db_file = db_file
+        self.legacy_json = legacy_json
+        self._conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+        # PRAGMA data_version only moves when *another* connection commits
+        self.data_version: Optional[int] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Opened on first use, so importing the bot doesn't create the database"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS guild_config ("
+                "guild_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT, "
+                "PRIMARY KEY (guild_id, key))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS config_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            self._conn = conn
+            self.data_version = self._data_version()
+        return self._conn
+
+    def _data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self) -> bool:
+        with self.lock:
+            version = self._data_version()
+            if version == self.data_version:
+                return False
+            self.data_version = version
+            return True
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute("SELECT guild_id, key, value FROM guild_config").fetchall()
+            imported = self.conn.execute("SELECT 1 FROM config_meta WHERE key = 'legacy_imported'").fetchone()
+
+        if not rows and not imported and self.legacy_json and os.path.exists(self.legacy_json):
+            return self._import_legacy()
+
+        data: Dict[str, Dict[str, Any]] = {}
+        for guild_id, key, value in rows:
+            data.setdefault(guild_id, {})[key] = json.loads(value)
+        return data
+
+    def _import_legacy(self) -> Dict[str, Dict[str, Any]]:
+        """One-time import of an existing guild_config.json"""
+        try:
+            with open(self.legacy_json, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error importing legacy configuration: {str(e)}")
+            return {}
+        data.pop("_meta", None)
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO guild_config (guild_id, key, value) VALUES (?, ?, ?)",
+                [(guild_id, key, json.dumps(value)) for guild_id, settings in data.items() for key, value in settings.items()]
+            )
+            self.conn.execute("INSERT OR REPLACE INTO config_meta (key, value) VALUES ('legacy_imported', '1')")
+        print(f"Imported configuration for {len(data)} guilds from {self.legacy_json}")
+        return data
+
+    def write(self, guild_id: str, changes: Dict[str, Any], removed: Iterable[str] = (), clear: bool = False) -> None:
+        self.write_many([(guild_id, changes, removed, clear)])
+
+    def write_many(self, updates: List[GuildUpdate]) -> None:
+        # Every guild's rows change in one SQLite transaction
+        try:
+            with self.lock, self.conn:
+                for guild_id, changes, removed, clear in updates:
+                    if clear:
+                        self.conn.execute("DELETE FROM guild_config WHERE guild_id = ?", (guild_id,))
+                    if removed:
+                        self.conn.executemany(
+                            "DELETE FROM guild_config WHERE guild_id = ? AND key = ?",
+                            [(guild_id, key) for key in removed]
+                        )
+                    if changes:
+                        self.conn.executemany(
+                            "INSERT OR REPLACE INTO guild_config (guild_id, key, value) VALUES (?, ?, ?)",
+                            [(guild_id, key, json.dumps(value)) for key, value in changes.items()]
+                        )
+        except Exception as e:
+            print(f"Error saving configuration: {str(e)}")
+
+    def get_schema_version(self) -> int:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM config_meta WHERE key = 'schema_version'").fetchone()
+        return int(row[0]) if row else 0
+
+    def set_schema_version(self, version: int) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO config_meta (key, value) VALUES ('schema_version', ?)", (str(version),))
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def create_backend(data_file: str = "guild_config.json") -> ConfigBackend:
+    """Pick a backend from the CONFIG_BACKEND environment variable ("json" or "sqlite")"""
+    kind = os.getenv("CONFIG_BACKEND", "json").lower()
+    if kind == "sqlite":
+        return SqliteConfigBackend(os.getenv("CONFIG_DB", "guild_config.db"), legacy_json=data_file)
+    return JsonConfigBackend(data_file, delay=float(os.getenv("CONFIG_WRITE_DELAY", "2.0")))
@@ -1,105 +1,328 @@
 import json
 import os
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+import atexit
 import random
 import datetime
+import re
+import sqlite3
+import threading
+
+# Dynamic tokens recognised in a response; anything else in braces stays literal
+TEMPLATE_TOKEN = re.compile(r"\{(random:[^}]+|user|server|uses)\}")
+
+# How many guilds' command maps to keep in memory
+CACHED_GUILDS = int(os.getenv("CUSTOM_COMMAND_CACHED_GUILDS", "1000"))
+
+# Segment kinds of a compiled response
+LITERAL, CHOICE, PLACEHOLDER = 0, 1, 2
+
+class ResponseTemplate:
+    """A custom command response compiled once into literal text, random choices and placeholders.
+
+    Supports ``{random:a|b|c}``, ``{user}``, ``{server}`` and ``{uses}``.
+    Rendering is a single pass over the segments with no regex work.
+    """
+    __slots__ = ("source", "segments")
+    
+    def __init__(self, source: str):
+        self.source = source
+        self.segments: List[Tuple[int, Any]] = []
+        
+        position = 0
+        for match in TEMPLATE_TOKEN.finditer(source):
+            if match.start() > position:
+                self.segments.append((LITERAL, source[position:match.start()]))
+            token = match.group(1)
+            if token.startswith("random:"):
+                self.segments.append((CHOICE, tuple(token[7:].split("|"))))
+            else:
+                self.segments.append((PLACEHOLDER, token))
+            position = match.end()
+        if position < len(source):
+            self.segments.append((LITERAL, source[position:]))
+    
+    def render(self, user: str = "", server: str = "", uses: int = 0) -> str:
+        """Render the response; each {random:...} token picks independently"""
+        values = {"user": user, "server": server, "uses": str(uses)}
+        parts = []
+        for kind, value in self.segments:
+            if kind == LITERAL:
+                parts.append(value)
+            elif kind == CHOICE:
+                parts.append(random.choice(value))
+            else:
+                parts.append(values[value])
+        return "".join(parts)
+
+class CommandStore:
+    """SQLite storage for custom commands, partitioned by guild.
+
+    The (guild_id, name) primary key keeps each guild's commands together and
+    in name order, so loading a guild, prefix search and pagination are all
+    index range scans, and every change is a single-row write.
+    """
+    
+    def __init__(self, db_file: str = "custom_commands.db"):
+        self.db_file = db_file
+        self._conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Opened on first use, so importing the bot doesn't create the database"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS custom_commands ("
+                "guild_id TEXT NOT NULL, name TEXT NOT NULL, response TEXT NOT NULL, "
+                "creator_id TEXT, uses INTEGER NOT NULL DEFAULT 0, created_at TEXT, "
+                "PRIMARY KEY (guild_id, name)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS command_meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def is_empty(self) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM custom_commands LIMIT 1").fetchone() is None
+    
+    def get_meta(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM command_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set_meta(self, key: str, value: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO command_meta (key, value) VALUES (?, ?)", (key, value))
+    
+    def load_guild(self, guild_id: str) -> Dict[str, Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name, response, creator_id, uses, created_at FROM custom_commands WHERE guild_id = ?",
+                (guild_id,)
+            ).fetchall()
+        return {
+            name: {"response": response, "creator_id": creator_id, "uses": uses, "created_at": created_at}
+            for name, response, creator_id, uses, created_at in rows
+        }
+    
+    def insert_many(self, rows: List[Tuple[str, str, Dict[str, Any]]]) -> None:
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO custom_commands (guild_id, name, response, creator_id, uses, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(guild_id, name, cmd["response"], cmd.get("creator_id"), cmd.get("uses", 0), cmd.get("created_at"))
+                 for guild_id, name, cmd in rows]
+            )
+    
+    def update_response(self, guild_id: str, name: str, response: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE custom_commands SET response = ? WHERE guild_id = ? AND name = ?",
+                (response, guild_id, name)
+            )
+    
+    def update_uses(self, counts: Dict[Tuple[str, str], int]) -> None:
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE custom_commands SET uses = ? WHERE guild_id = ? AND name = ?",
+                [(uses, guild_id, name) for (guild_id, name), uses in counts.items()]
+            )
+    
+    def delete(self, guild_id: str, name: str) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM custom_commands WHERE guild_id = ? AND name = ?", (guild_id, name))
+    
+    def list_names(self, guild_id: str, prefix: str = "", offset: int = 0, limit: int = -1) -> List[str]:
+        # Prefix match as a range on the primary key: prefix <= name < prefix + U+10FFFF
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT name FROM custom_commands WHERE guild_id = ? AND name >= ? AND name < ? "
+                "ORDER BY name LIMIT ? OFFSET ?",
+                (guild_id, prefix, prefix + "\U0010ffff", limit, offset)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def count(self, guild_id: str, prefix: str = "") -> int:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM custom_commands WHERE guild_id = ? AND name >= ? AND name < ?",
+                (guild_id, prefix, prefix + "\U0010ffff")
+            ).fetchone()[0]
 
 class CustomCommandManager:
-    """Manages custom commands for the bot"""
+    """Manages custom commands for the bot.
+
+    Commands live in SQLite, one partition per guild. A guild's command map
+    is loaded on first use and the least recently used guilds are evicted
+    once more than ``cached_guilds`` are in memory.
+    """
     
-    def __init__(self, data_file: str = "custom_commands.json"):
+    def __init__(self, data_file: str = "custom_commands.json", db_file: str = "custom_commands.db",
+                 cached_guilds: int = CACHED_GUILDS):
         """Initialize the custom command manager"""
         self.data_file = data_file
-        self.commands: Dict[str, Dict[str, Any]] = {}
+        self.store = CommandStore(db_file)
+        self.cached_guilds = cached_guilds
+        # guild_id -> {name -> command}, in least recently used order
+        self.commands: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+        # (guild_id, name) pairs whose use count changed since the last flush
+        self.dirty_uses: set = set()
+        # Compiled responses per guild, built at add/edit time or on first use
+        self.templates: Dict[str, Dict[str, ResponseTemplate]] = {}
         self.load_commands()
+        atexit.register(self.flush_uses)
     
     def load_commands(self) -> None:
-        """Load commands from the data file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    self.commands = json.load(f)
-            except Exception as e:
-                print(f"Error loading custom commands: {str(e)}")
-                self.commands = {}
+        """Import the legacy custom_commands.json once; guilds themselves load lazily"""
+        # Check the file first: without one there's nothing to import and the database stays unopened
+        if not os.path.exists(self.data_file) or self.store.get_meta("legacy_imported"):
+            return
+        if not self.store.is_empty():
+            self.store.set_meta("legacy_imported", "1")
+            return
+        
+        try:
+            with open(self.data_file, 'r') as f:
+                legacy = json.load(f)
+            self.store.insert_many([
+                (guild_id, name, cmd) for guild_id, guild_commands in legacy.items()
+                for name, cmd in guild_commands.items()
+            ])
+            self.store.set_meta("legacy_imported", "1")
+            print(f"Imported custom commands for {len(legacy)} guilds from {self.data_file}")
+        except Exception as e:
+            print(f"Error loading custom commands: {str(e)}")
     
     def save_commands(self) -> None:
-        """Save commands to the data file"""
+        """Commands are written row by row as they change; this only flushes use counts"""
+        self.flush_uses()
+    
+    def _guild(self, guild_id: str) -> Dict[str, Dict[str, Any]]:
+        """A guild's command map, loading it and evicting idle guilds as needed"""
+        guild_commands = self.commands.get(guild_id)
+        if guild_commands is not None:
+            self.commands.move_to_end(guild_id)
+            return guild_commands
+        
+        guild_commands = self.store.load_guild(guild_id)
+        self.commands[guild_id] = guild_commands
+        while len(self.commands) > self.cached_guilds:
+            evicted = next(iter(self.commands))
+            self.flush_uses(evicted)
+            del self.commands[evicted]
+            self.templates.pop(evicted, None)
+        return guild_commands
+    
+    def flush_uses(self, guild_id: Optional[str] = None) -> int:
+        """Write buffered use counts to storage, returns how many were written"""
+        dirty = {key for key in self.dirty_uses if guild_id is None or key[0] == guild_id}
+        if not dirty:
+            return 0
+        
+        self.dirty_uses -= dirty
+        counts = {}
+        for key in dirty:
+            cmd = self.commands.get(key[0], {}).get(key[1])
+            if cmd is not None:
+                counts[key] = cmd["uses"]
+        
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.commands, f, indent=4)
+            self.store.update_uses(counts)
         except Exception as e:
-            print(f"Error saving custom commands: {str(e)}")
+            print(f"Error saving custom command usage: {str(e)}")
+            self.dirty_uses |= dirty
+            return 0
+        return len(counts)
     
     def add_command(self, guild_id: str, name: str, response: str, creator_id: str) -> bool:
         """Add a new custom command"""
-        if guild_id not in self.commands:
-            self.commands[guild_id] = {}
+        guild_commands = self._guild(guild_id)
             
         name = name.lower()
-        if name in self.commands[guild_id]:
+        if name in guild_commands:
             return False  # Command already exists
             
-        self.commands[guild_id][name] = {
+        cmd = {
             "response": response,
             "creator_id": creator_id,
             "uses": 0,
             "created_at": str(datetime.datetime.now())
         }
         
-        self.save_commands()
+        try:
+            self.store.insert_many([(guild_id, name, cmd)])
+        except Exception as e:
+            print(f"Error saving custom commands: {str(e)}")
+            return False
+        
+        guild_commands[name] = cmd
+        self.templates.setdefault(guild_id, {})[name] = ResponseTemplate(response)
         return True
     
     def edit_command(self, guild_id: str, name: str, new_response: str) -> bool:
         """Edit an existing custom command"""
-        if guild_id not in self.commands or name not in self.commands[guild_id]:
+        guild_commands = self._guild(guild_id)
+        if name not in guild_commands:
+            return False
+        
+        try:
+            self.store.update_response(guild_id, name, new_response)
+        except Exception as e:
+            print(f"Error saving custom commands: {str(e)}")
             return False
             
-        self.commands[guild_id][name]["response"] = new_response
-        self.save_commands()
+        guild_commands[name]["response"] = new_response
+        self.templates.setdefault(guild_id, {})[name] = ResponseTemplate(new_response)
         return True
     
     def delete_command(self, guild_id: str, name: str) -> bool:
         """Delete a custom command"""
-        if guild_id not in self.commands or name not in self.commands[guild_id]:
+        guild_commands = self._guild(guild_id)
+        if name not in guild_commands:
+            return False
+        
+        try:
+            self.store.delete(guild_id, name)
+        except Exception as e:
+            print(f"Error saving custom commands: {str(e)}")
             return False
             
-        del self.commands[guild_id][name]
-        self.save_commands()
+        del guild_commands[name]
+        self.templates.get(guild_id, {}).pop(name, None)
+        self.dirty_uses.discard((guild_id, name))
         return True
     
-    def get_command(self, guild_id: str, name: str) -> Optional[str]:
-        """Get a command's response"""
-        if guild_id not in self.commands or name not in self.commands[guild_id]:
+    def get_command(self, guild_id: str, name: str, user: str = "", server: str = "") -> Optional[str]:
+        """Get a command's rendered response"""
+        cmd = self._guild(guild_id).get(name)
+        if cmd is None:
             return None
             
-        cmd = self.commands[guild_id][name]
+        # Counted in memory only; flush_uses persists it later
         cmd["uses"] += 1
-        self.save_commands()
-        
-        # Process dynamic content
-        response = cmd["response"]
+        self.dirty_uses.add((guild_id, name))
         
-        # Handle random choices
-        if "{random:" in response:
-            import re
-            for match in re.finditer(r"{random:([^}]+)}", response):
-                options = match.group(1).split("|")
-                choice = random.choice(options)
-                response = response.replace(match.group(0), choice)
+        guild_templates = self.templates.setdefault(guild_id, {})
+        template = guild_templates.get(name)
+        if template is None:
+            template = guild_templates[name] = ResponseTemplate(cmd["response"])
         
-        return response
+        return template.render(user=user, server=server, uses=cmd["uses"])
     
-    def list_commands(self, guild_id: str) -> List[str]:
-        """List all custom commands for a guild"""
-        if guild_id not in self.commands:
-            return []
-            
-        return list(self.commands[guild_id].keys())
+    def list_commands(self, guild_id: str, prefix: str = "", page: int = 0, per_page: Optional[int] = None) -> List[str]:
+        """List a guild's custom commands in name order, optionally filtered by prefix and paginated"""
+        if per_page is None:
+            return self.store.list_names(guild_id, prefix.lower())
+        return self.store.list_names(guild_id, prefix.lower(), offset=page * per_page, limit=per_page)
+    
+    def count_commands(self, guild_id: str, prefix: str = "") -> int:
+        """Number of custom commands in a guild, optionally only those matching a prefix"""
+        return self.store.count(guild_id, prefix.lower())
         
     def get_command_details(self, guild_id: str, name: str) -> Optional[Dict[str, Any]]:
         """Get details about a specific command"""
-        if guild_id not in self.commands or name not in self.commands[guild_id]:
-            return None
-            
-        return self.commands[guild_id][name]
+        return self._guild(guild_id).get(name)
@@ -1,16 +1,26 @@
+import time
+STARTUP_BEGAN = time.perf_counter()  # For the startup-time report, before any heavy imports
 from typing import Final
 import os
-import time
+import sys
+import asyncio
+import importlib
 import platform
 import datetime
 from dotenv import load_dotenv
 from discord import Intents, Client, Message, Embed, version_info as discord_version
 from discord.ext import tasks, commands
-from responses import get_response
+from responses import get_response, prefilter as response_prefilter, PREFILTER_ENABLED
 import discord
 from discord.file import File
-from welcome_card import create_welcome_card, create_welcome_embed
 from config import GuildConfig
+from custom_commands import CustomCommandManager
+from state import StateSnapshot
+from automod import automod
+from modlog import mod_log
+from activity import activity
+from ratelimit import command_limiter, format_wait, DEFAULT_COOLDOWNS
+import moderation
 
 # Load the environment variables
 load_dotenv()
@@ -20,6 +30,10 @@ BOT_VERSION: Final[str] = "1.0.0"
 BOT_CREATOR: Final[str] = "MAHITO"
 ANNOUNCEMENT_CHANNEL_ID: Final[int] = int(os.getenv('ANNOUNCEMENT_CHANNEL_ID', '0'))  # Set your default channel ID in .env
 PREFIX: Final[str] = os.getenv('COMMAND_PREFIX', '!')  # Configurable command prefix
+STATE_SNAPSHOT_MINUTES: Final[int] = int(os.getenv('STATE_SNAPSHOT_MINUTES', '5'))  # Periodic state checkpoint interval
+CONFIG_RELOAD_SECONDS: Final[int] = int(os.getenv('CONFIG_RELOAD_SECONDS', '30'))  # How often to look for external config edits
+PREFILTER_REFRESH_SECONDS: Final[int] = int(os.getenv('RESPONSE_PREFILTER_REFRESH_SECONDS', '60'))  # How often to re-fetch the trigger prefilter
+WELCOME_CARD_PRELOAD: Final[bool] = os.getenv('WELCOME_CARD_PRELOAD', '1') == '1'  # Import the card renderer in the background once ready
 
 # Set up the bot
 Intents: Intents = Intents.default()
@@ -30,8 +44,12 @@ client: Client = Client(intents=Intents)
 # Track start time for uptime command
 start_time = time.time()
 
+# Startup phases (name -> seconds), reported once the bot is ready
+startup_timings = {}
+connect_began = STARTUP_BEGAN
+
 # Available commands list for error handling
-COMMANDS = ['!ping', '!help', '!info', '!poll', '!stats', '!remind', '!welcome']
+COMMANDS = ['!ping', '!help', '!info', '!poll', '!stats', '!remind', '!welcome', '!clear', '!cases', '!raid', '!activity', '!cooldown']
 COMMAND_SUGGESTIONS = {
     'ping': '!ping',
     'help': '!help',
@@ -46,11 +64,19 @@ COMMAND_SUGGESTIONS = {
     'remind': '!remind',
     'reminder': '!remind',
     'wel': '!welcome',
+    'purge': '!clear',
+    'case': '!cases',
+    'history': '!cases',
+    'raidclean': '!raid',
+    'activty': '!activity',
+    'active': '!activity',
+    'cooldowns': '!cooldown',
+    'ratelimit': '!cooldown',
 }
 
 # Role-based command permissions
-ADMIN_COMMANDS = ['!welcome', '!announce']
-MOD_COMMANDS = ['!mute', '!clear']
+ADMIN_COMMANDS = ['!welcome', '!announce', '!raid', '!cooldown']
+MOD_COMMANDS = ['!mute', '!clear', '!cases']
 
 # Function to check if user has required permissions
 def has_permission(message: Message, command: str) -> bool:
@@ -74,6 +100,28 @@ command_counts = {}
 # Initialize the guild config
 guild_config = GuildConfig()
 
+# Guild-defined commands, answered in-process without a responder round trip
+custom_commands = CustomCommandManager()
+
+# Warm restart: in-memory state is checkpointed and restored across restarts
+state_snapshot = StateSnapshot()
+
+def restore_into(target: dict):
+    """Build a restore callback that refills a module-level dict in place"""
+    def restore(data: dict) -> None:
+        target.clear()
+        target.update(data)
+    return restore
+
+state_snapshot.register('active_polls', lambda: dict(active_polls), restore_into(active_polls))
+state_snapshot.register('reminders', lambda: {uid: list(items) for uid, items in reminders.items()}, restore_into(reminders))
+state_snapshot.register('message_counts', lambda: dict(message_counts), restore_into(message_counts))
+state_snapshot.register('command_counts', lambda: dict(command_counts), restore_into(command_counts))
+state_snapshot.register('activity', activity.dump, activity.restore)
+state_snapshot.register('muted_users', moderation.dump_muted_users, moderation.restore_muted_users)
+state_snapshot.register('mute_schedule', moderation.mute_scheduler.dump, moderation.mute_scheduler.restore)
+state_snapshot.register('mute_role_channels', moderation.role_provisioner.dump, moderation.role_provisioner.restore)
+
 def get_uptime() -> str:
     """Calculate and format the bot's uptime"""
     uptime_seconds = int(time.time() - start_time)
@@ -109,6 +157,20 @@ def get_command_suggestion(cmd: str) -> str:
     
     return None
 
+async def within_cooldown(message: Message, command: str, notify: bool = True) -> bool:
+    """Take a use of command for the author; False (after an occasional notice) if they're on cooldown"""
+    if message.guild and message.author.guild_permissions.manage_messages:
+        return True  # Moderators are never throttled
+    guild_id = message.guild.id if message.guild else None
+    settings = guild_config.view(guild_id) if message.guild else guild_config.default_view
+    wait = command_limiter.check(settings, guild_id, message.author.id, command)
+    if not wait:
+        return True
+    if notify and command_limiter.should_notify(guild_id or 0, message.author.id):
+        await message.channel.send(f"⏳ {message.author.mention}, slow down! You can use `{command}` again in {format_wait(wait)}.",
+                                   delete_after=min(wait, 10))
+    return False
+
 # Message event
 async def send_message(message: Message, user_message: str) -> None:
     if not user_message:
@@ -120,6 +182,12 @@ async def send_message(message: Message, user_message: str) -> None:
     if user_id not in message_counts:
         message_counts[user_id] = 0
     message_counts[user_id] += 1
+    if message.guild:
+        activity.record(message.guild.id, message.channel.id, message.author.id)
+
+    # Word filter runs before anything else so filtered messages never reach commands or responses
+    if message.guild and await automod.check(message, guild_config.view(message.guild.id)):
+        return
     
     # Handle commands
     if user_message.lower().startswith('!'):
@@ -130,6 +198,9 @@ async def send_message(message: Message, user_message: str) -> None:
             await message.channel.send("You don't have permission to use this command.")
             return
         
+        if not await within_cooldown(message, command):
+            return
+        
         # Track command usage
         if command not in command_counts:
             command_counts[command] = 0
@@ -280,6 +351,33 @@ async def send_message(message: Message, user_message: str) -> None:
         await handle_welcome_command(message, args)
         return
     
+    elif user_message.lower() == '!clear' or user_message.lower().startswith('!clear '):
+        await handle_clear_command(message, user_message.split()[1:])
+        return
+    
+    elif user_message.lower() == '!cases' or user_message.lower().startswith('!cases '):
+        await handle_cases_command(message, user_message.split()[1:])
+        return
+    
+    elif user_message.lower() == '!activity' or user_message.lower().startswith('!activity '):
+        await handle_activity_command(message)
+        return
+    
+    elif user_message.lower() == '!raid' or user_message.lower().startswith('!raid '):
+        await handle_raid_command(message, user_message.split()[1:])
+        return
+    
+    elif user_message.lower() == '!cooldown' or user_message.lower().startswith('!cooldown '):
+        await handle_cooldown_command(message, user_message.split()[1:])
+        return
+    
+    # Guild-defined custom commands come right after the built-ins
+    elif message.guild and user_message.startswith('!') and (custom_response := custom_commands.get_command(
+            str(message.guild.id), user_message.split()[0][1:].lower(),
+            user=message.author.display_name, server=message.guild.name)) is not None:
+        await message.channel.send(custom_response)
+        return
+    
     # Error handling for command-like messages that don't match any command
     elif user_message.startswith('!'):
         command = user_message.split()[0].lower()
@@ -297,7 +395,11 @@ async def send_message(message: Message, user_message: str) -> None:
         user_message = user_message[1:]
     
     try:
-        response: str = await get_response(user_message)  # Await the coroutine
+        # Chat replies are only rate limited once the prefilter has let the message through
+        response = await get_response(user_message, allow_lookup=lambda: within_cooldown(message, 'respond', notify=False))
+        if response is None:
+            # The prefilter ruled the message out and is configured to stay quiet
+            return
         await message.author.send(response) if is_private else await message.channel.send(response)
     except Exception as e:
         print(f"Error while processing message: {str(e)}")
@@ -357,6 +459,31 @@ async def daily_announcement():
     except Exception as e:
         print(f"ERROR: Failed to send daily announcement: {str(e)}")
 
+# Periodically checkpoint in-memory state
+@tasks.loop(minutes=STATE_SNAPSHOT_MINUTES)
+async def checkpoint_state():
+    custom_commands.flush_uses()
+    activity.prune()
+    size = state_snapshot.save()
+    print(f"State checkpoint saved ({size} bytes).")
+    # Only present if a card was rendered (or preloaded) during this run
+    if "welcome_card" in sys.modules:
+        stats = sys.modules["welcome_card"].renderer.stats()
+        print("Welcome cards: " + ", ".join(f"{name} {value}" for name, value in stats.items()))
+
+# Pick up guild config edited outside the bot
+@tasks.loop(seconds=CONFIG_RELOAD_SECONDS)
+async def reload_config():
+    changed = guild_config.refresh()
+    if changed:
+        print(f"Reloaded configuration for {len(changed)} guilds.")
+
+# Keep the local trigger prefilter in step with the response service
+@tasks.loop(seconds=PREFILTER_REFRESH_SECONDS)
+async def refresh_prefilter():
+    if await response_prefilter.refresh():
+        print(f"Response prefilter refreshed ({response_prefilter.skipped} lookups skipped so far).")
+
 # Handling the startups for our bot
 @client.event
 async def on_ready() -> None:
@@ -371,19 +498,49 @@ async def on_ready() -> None:
         check_reminders.start()
         print("Reminder check task started.")
 
+    if not checkpoint_state.is_running():
+        checkpoint_state.start()
+        print("State checkpoint task started.")
+
+    if not reload_config.is_running():
+        reload_config.start()
+        print("Config reload task started.")
+
+    if PREFILTER_ENABLED and not refresh_prefilter.is_running():
+        refresh_prefilter.start()
+        print("Response prefilter task started.")
+
+    # Role-based mutes restored from the snapshot expire from here on
+    moderation.mute_scheduler.start(client)
+    
+    # Reconnects fire on_ready again; only the first one finishes startup
+    if "ready" not in startup_timings:
+        startup_timings["connect"] = time.perf_counter() - connect_began
+        startup_timings["ready"] = time.perf_counter() - STARTUP_BEGAN
+        print(startup_report())
+        
+        if WELCOME_CARD_PRELOAD:
+            # Pillow and friends load off the event loop so the first join doesn't pay for the import
+            asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "welcome_card")
+
+def startup_report() -> str:
+    """One line summary of where startup time went"""
+    phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_timings.items() if name != "ready")
+    return f"Startup: {phases}; ready in {startup_timings['ready']:.2f}s"
+
 # Welcome new members
 @client.event
 async def on_member_join(member):
     try:
         # Get the welcome configuration for this guild
         guild_id = str(member.guild.id)
-        welcome_enabled = guild_config.get(guild_id, "welcome_enabled")
+        settings = guild_config.view(guild_id)
         
-        if not welcome_enabled:
+        if not settings.welcome_enabled:
             return
         
         # Get the welcome channel (custom or system)
-        custom_channel_id = guild_config.get(guild_id, "welcome_channel")
+        custom_channel_id = settings.welcome_channel
         if custom_channel_id:
             welcome_channel = client.get_channel(int(custom_channel_id))
         else:
@@ -393,20 +550,24 @@ async def on_member_join(member):
             return
         
         # Get custom welcome message if set
-        welcome_message = guild_config.get(guild_id, "welcome_message")
+        welcome_message = settings.welcome_message
         welcome_message = welcome_message.replace("{user}", member.display_name).replace("{server}", member.guild.name)
         
         # Get guild accent color (or use default)
         accent_color = (46, 204, 113)  # Default green
         
         # Create and send the welcome card
+        from welcome_card import create_welcome_card, create_welcome_embed
         card_image = await create_welcome_card(
             username=member.display_name,
             avatar_url=member.display_avatar.url,
             server_name=member.guild.name,
             member_count=len(member.guild.members),
             custom_message=welcome_message,
-            accent_color=accent_color
+            accent_color=accent_color,
+            guild_id=guild_id,
+            output_format=settings.welcome_card_format,
+            max_bytes=settings.welcome_card_max_bytes
         )
         
         if card_image:
@@ -420,7 +581,7 @@ async def on_member_join(member):
             
             # Send the welcome card with embed
             await welcome_channel.send(
-                file=File(fp=card_image, filename="welcome.png"),
+                file=File(fp=card_image, filename="welcome" + os.path.splitext(card_image.name)[1]),
                 embed=embed
             )
         else:
@@ -438,6 +599,267 @@ async def on_member_join(member):
     except Exception as e:
         print(f"Error in welcome message: {str(e)}")
 
+# Purge messages, streaming progress back to the moderator
+async def handle_clear_command(message, args):
+    """Handle !clear <count> [@user] and !clear all @user"""
+    if not message.guild:
+        await message.channel.send("This command can only be used in a server.")
+        return
+    
+    usage = ("Usage: `!clear <count>` to delete recent messages, `!clear <count> @user` to delete a user's "
+             "messages here, or `!clear all @user` to purge a user from every channel.")
+    if not args:
+        await message.channel.send(usage)
+        return
+    
+    target = message.mentions[0] if message.mentions else None
+    
+    if args[0].lower() == "all":
+        if not target:
+            await message.channel.send(usage)
+            return
+        
+        status = await message.channel.send(f"🧹 Purging {target.mention} from all channels...")
+        last_edit = 0.0
+        
+        async def report(progress):
+            nonlocal last_edit
+            # Edits are rate limited too; update at most every couple of seconds
+            if time.time() - last_edit < 2:
+                return
+            last_edit = time.time()
+            await status.edit(content=(
+                f"🧹 Purging {target.mention}: {progress.channels_done}/{progress.channels_total} channels, "
+                f"{progress.scanned} scanned, {progress.deleted} deleted..."
+            ))
+        
+        progress = await moderation.purge_user_in_guild(message.guild, target, on_progress=report)
+        mod_log.record(message.guild, "clear", target, message.author, None, guild_config.view(message.guild.id),
+                       details=f"Deleted {progress.deleted} messages across {progress.channels_total} channels")
+        await status.edit(content=(
+            f"✅ Purged {progress.deleted} messages from {target.mention} across "
+            f"{progress.channels_total} channels ({progress.scanned} scanned)."
+        ))
+        return
+    
+    try:
+        count = int(args[0])
+    except ValueError:
+        await message.channel.send(usage)
+        return
+    if count <= 0 or count > 1000:
+        await message.channel.send("Please specify between 1 and 1000 messages.")
+        return
+    
+    if target:
+        status = await message.channel.send(f"🧹 Deleting up to {count} messages from {target.mention}...")
+        
+        async def report(progress):
+            await status.edit(content=f"🧹 {progress.scanned} scanned, {progress.deleted} deleted...")
+        
+        deleted = await moderation.clear_messages(message.channel, limit=count, user=target, on_progress=report)
+        mod_log.record(message.guild, "clear", target, message.author, None, guild_config.view(message.guild.id),
+                       details=f"Deleted {deleted} messages in {message.channel.mention}")
+        await status.edit(content=f"✅ Deleted {deleted} messages from {target.mention}.")
+    else:
+        # The status message would be swept up by the purge, so only report the result
+        deleted = await moderation.clear_messages(message.channel, limit=count + 1)
+        mod_log.record(message.guild, "clear", None, message.author, None, guild_config.view(message.guild.id),
+                       details=f"Deleted {max(deleted - 1, 0)} messages in {message.channel.mention}")
+        await message.channel.send(f"✅ Deleted {max(deleted - 1, 0)} messages.", delete_after=5)
+
+# Server and channel activity from the rollups
+async def handle_activity_command(message):
+    """Handle !activity and !activity #channel"""
+    if not message.guild:
+        await message.channel.send("This command can only be used in a server.")
+        return
+    
+    now = activity.now_minute()
+    if message.channel_mentions:
+        channel = message.channel_mentions[0]
+        series = activity.channel(message.guild.id, channel.id)
+        title = f"Activity in #{channel.name}"
+    else:
+        channel = None
+        series = activity.guild(message.guild.id)
+        title = f"Activity in {message.guild.name}"
+    
+    if series is None:
+        await message.channel.send("No activity recorded yet.")
+        return
+    
+    embed = Embed(title=title, color=0x1abc9c)
+    embed.add_field(name="Last 10 minutes", value=f"{series.messages_last_minutes(10, now)} messages", inline=True)
+    embed.add_field(name="Last hour", value=f"{series.messages_last_minutes(60, now)} messages", inline=True)
+    embed.add_field(name="Last 24 hours", value=f"{series.messages_last_hours(24, now)} messages", inline=True)
+    embed.add_field(name="Active users (hour)", value=f"~{series.unique_users(1, now)}", inline=True)
+    embed.add_field(name="Active users (24 hours)", value=f"~{series.unique_users(24, now)}", inline=True)
+    
+    # Last hour in 10 minute steps, oldest first
+    histogram = series.minute_histogram(now)
+    steps = [sum(histogram[i:i + 10]) for i in range(0, len(histogram), 10)]
+    peak = max(steps) or 1
+    bars = "▁▂▃▄▅▆▇█"
+    embed.add_field(name="Last hour (10 min steps)",
+                    value="`" + "".join(bars[round(step / peak * (len(bars) - 1))] for step in steps) + "`",
+                    inline=False)
+    
+    if channel is None:
+        top = activity.top_channels(message.guild.id, [c.id for c in message.guild.text_channels])
+        if top:
+            embed.add_field(name="Busiest channels (hour)",
+                            value="\n".join(f"<#{channel_id}>: {count}" for channel_id, count in top), inline=False)
+    
+    embed.set_footer(text="User counts are estimates")
+    await message.channel.send(embed=embed)
+
+# Per-command cooldowns, stored in the guild's config
+async def handle_cooldown_command(message, args):
+    """Handle !cooldown, !cooldown <command> <uses> <seconds> [user|guild] and !cooldown <command> off|reset"""
+    if not message.guild:
+        await message.channel.send("This command can only be used in a server.")
+        return
+
+    guild_id = message.guild.id
+    settings = guild_config.view(guild_id)
+    configured = guild_config.get(guild_id, "command_cooldowns") or {}
+
+    if not args:
+        embed = Embed(title="Command Cooldowns", color=0xf39c12)
+        for command in sorted(set(DEFAULT_COOLDOWNS) | set(configured)):
+            _, limits = command_limiter.limits(settings, command)
+            value = "\n".join(f"{scope}: {uses} per {per}s" for scope, (uses, per) in limits.items()) or "off"
+            embed.add_field(name=command + (" (custom)" if command in configured else ""), value=value, inline=True)
+        embed.set_footer(text="'respond' covers chat replies, '*' any other command. Moderators are exempt.")
+        await message.channel.send(embed=embed)
+        return
+
+    command = args[0].lower()
+    usage = "Usage: `!cooldown <command> <uses> <seconds> [user|guild]` or `!cooldown <command> off|reset`"
+    if len(args) == 2 and args[1].lower() in ("off", "reset"):
+        if args[1].lower() == "off":
+            configured[command] = {}
+        else:
+            configured.pop(command, None)
+    elif len(args) in (3, 4) and args[1].isdigit() and args[2].isdigit():
+        uses, per = int(args[1]), int(args[2])
+        scope = args[3].lower() if len(args) == 4 else "user"
+        if scope not in ("user", "guild") or uses <= 0 or per <= 0:
+            await message.channel.send(usage)
+            return
+        _, current = command_limiter.limits(settings, command)
+        limits = {name: list(limit) for name, limit in current.items()}
+        limits[scope] = [uses, per]
+        configured[command] = limits
+    else:
+        await message.channel.send(usage)
+        return
+
+    guild_config.set(guild_id, "command_cooldowns", configured)
+    await message.channel.send(f"✅ Cooldowns for `{command}` updated.")
+
+# Raid cleanup: ban or kick everyone who joined in a recent window
+async def handle_raid_command(message, args):
+    """Handle !raid <minutes> (preview) and !raid <minutes> <ban|kick> [reason]"""
+    if not message.guild:
+        await message.channel.send("This command can only be used in a server.")
+        return
+    
+    usage = ("Usage: `!raid <minutes>` to preview members who joined in the last N minutes, "
+             "then `!raid <minutes> ban|kick [reason]` to remove them.")
+    if not args or not args[0].isdigit():
+        await message.channel.send(usage)
+        return
+    minutes = int(args[0])
+    if minutes <= 0 or minutes > 1440:
+        await message.channel.send("Please specify a window between 1 and 1440 minutes.")
+        return
+    
+    members = moderation.recent_joins(message.guild, minutes)
+    if not members:
+        await message.channel.send(f"Nobody joined in the last {minutes} minutes.")
+        return
+    
+    if len(args) == 1:
+        preview = ", ".join(member.mention for member in members[:20])
+        more = f" and {len(members) - 20} more" if len(members) > 20 else ""
+        await message.channel.send(
+            f"⚠️ {len(members)} members joined in the last {minutes} minutes: {preview}{more}\n"
+            f"Run `!raid {minutes} ban` or `!raid {minutes} kick` to remove them."
+        )
+        return
+    
+    action = args[1].lower()
+    if action not in ("ban", "kick"):
+        await message.channel.send(usage)
+        return
+    reason = " ".join(args[2:]) or f"Raid cleanup by {message.author}"
+    
+    status = await message.channel.send(f"🚨 Starting raid cleanup: {action} {len(members)} members...")
+    last_edit = 0.0
+    
+    async def report(result):
+        nonlocal last_edit
+        if time.time() - last_edit < 2:
+            return
+        last_edit = time.time()
+        await status.edit(content=f"🚨 Raid cleanup: {result.done}/{result.total} processed ({result.per_second:.1f}/s)...")
+    
+    if action == "ban":
+        result = await moderation.bulk_ban(message.guild, members, reason=reason, on_progress=report)
+    else:
+        result = await moderation.bulk_kick(message.guild, members, reason=reason, on_progress=report)
+    
+    mod_log.record_many(message.guild, action, result.succeeded, message.author, reason,
+                        guild_config.view(message.guild.id), details=f"Raid cleanup of joins in the last {minutes} minutes")
+    text = f"✅ Raid cleanup done. {result.summary()}"
+    if result.failed:
+        text += "\nFailed: " + ", ".join(f"<@{user_id}>" for user_id in list(result.failed)[:20])
+    await status.edit(content=text)
+
+# Look up moderation history
+async def handle_cases_command(message, args):
+    """Handle !cases [@user] [page]"""
+    if not message.guild:
+        await message.channel.send("This command can only be used in a server.")
+        return
+    
+    target = message.mentions[0] if message.mentions else None
+    page = 1
+    if args and args[-1].isdigit():
+        page = max(int(args[-1]), 1)
+    per_page = 10
+    offset = (page - 1) * per_page
+    
+    if target:
+        cases = mod_log.store.for_target(message.guild.id, target.id, limit=per_page, offset=offset)
+        total = mod_log.store.count_for_target(message.guild.id, target.id)
+        title = f"Moderation cases for {target.display_name}"
+    else:
+        cases = mod_log.store.recent(message.guild.id, limit=per_page, offset=offset)
+        total = mod_log.store.count(message.guild.id)
+        title = "Recent moderation cases"
+    
+    if not cases:
+        await message.channel.send("No moderation cases found." if page == 1 else f"There is no page {page}.")
+        return
+    
+    embed = Embed(title=title, color=0x95a5a6)
+    for case in cases:
+        lines = [f"By <@{case['moderator_id']}> <t:{int(case['created_at'])}:R>"]
+        if not target and case['target_id']:
+            lines.append(f"Target: <@{case['target_id']}>")
+        if case['reason']:
+            lines.append(f"Reason: {case['reason']}")
+        if case['details']:
+            lines.append(case['details'])
+        embed.add_field(name=f"#{case['case_number']} · {case['action'].title()}", value="\n".join(lines)[:1024], inline=False)
+    
+    pages = (total + per_page - 1) // per_page
+    embed.set_footer(text=f"Page {page}/{pages} · {total} cases")
+    await message.channel.send(embed=embed)
+
 # Update the !welcome command to configure welcome settings
 async def handle_welcome_command(message, args):
     """Handle welcome command and its subcommands"""
@@ -472,6 +894,7 @@ async def handle_welcome_command(message, args):
                 "`!welcome message <text>` - Set custom welcome message\n"
                 "`!welcome channel <#channel>` - Set welcome channel\n"
                 "`!welcome test` - Test current welcome message\n"
+                "`!welcome format <png|png_palette|webp|jpeg|auto> [max KB]` - Set card encoding\n"
                 "`!welcome reset` - Reset to defaults"
             ),
             inline=False
@@ -512,17 +935,42 @@ async def handle_welcome_command(message, args):
         guild_config.set(guild_id, "welcome_channel", str(channel.id))
         await message.channel.send(f"✅ Welcome channel set to {channel.mention}")
         
+    elif subcommand == "format" and len(args) > 1:
+        from welcome_card import CARD_FORMATS
+        card_format = args[1].lower()
+        if card_format != "auto" and card_format not in CARD_FORMATS:
+            await message.channel.send(f"Unknown format. Choose one of: {', '.join(CARD_FORMATS)}, auto")
+            return
+        
+        max_bytes = None
+        if len(args) > 2:
+            try:
+                max_bytes = int(args[2]) * 1024
+            except ValueError:
+                await message.channel.send("Please specify the size budget in whole kilobytes.")
+                return
+        
+        with guild_config.transaction() as txn:
+            txn.set(guild_id, "welcome_card_format", card_format)
+            txn.set(guild_id, "welcome_card_max_bytes", max_bytes)
+        budget_text = f" with a {max_bytes // 1024} KB budget" if max_bytes else ""
+        await message.channel.send(f"✅ Welcome cards will be encoded as {card_format}{budget_text}.")
+        
     elif subcommand == "test":
         # Simulate welcome message for the command user
         welcome_message = guild_config.get(guild_id, "welcome_message")
         welcome_message = welcome_message.replace("{user}", message.author.display_name).replace("{server}", message.guild.name)
         
+        from welcome_card import create_welcome_card, create_welcome_embed
         card_image = await create_welcome_card(
             username=message.author.display_name,
             avatar_url=message.author.display_avatar.url,
             server_name=message.guild.name,
             member_count=len(message.guild.members),
-            custom_message=welcome_message
+            custom_message=welcome_message,
+            guild_id=guild_id,
+            output_format=guild_config.get(guild_id, "welcome_card_format"),
+            max_bytes=guild_config.get(guild_id, "welcome_card_max_bytes")
         )
         
         if card_image:
@@ -535,16 +983,17 @@ async def handle_welcome_command(message, args):
             
             await message.channel.send(
                 content="**Welcome Card Preview:**",
-                file=File(fp=card_image, filename="welcome_preview.png"),
+                file=File(fp=card_image, filename="welcome_preview" + os.path.splitext(card_image.name)[1]),
                 embed=embed
             )
         else:
             await message.channel.send("Failed to generate welcome card preview.")
             
     elif subcommand == "reset":
-        guild_config.reset(guild_id, "welcome_enabled")
-        guild_config.reset(guild_id, "welcome_message")
-        guild_config.reset(guild_id, "welcome_channel")
+        with guild_config.transaction() as txn:
+            txn.reset(guild_id, "welcome_enabled")
+            txn.reset(guild_id, "welcome_message")
+            txn.reset(guild_id, "welcome_channel")
         await message.channel.send("✅ Welcome settings have been reset to defaults.")
         
     else:
@@ -581,6 +1030,14 @@ async def on_message(message: Message) -> None:
             # If even sending the error embed fails, try a simple message
             await message.channel.send("Sorry, an error occurred while processing your message.")
 
+# Keep the Muted role's overwrites complete as channels are added
+@client.event
+async def on_guild_channel_create(channel):
+    try:
+        await moderation.role_provisioner.patch_channel(channel)
+    except Exception as e:
+        print(f"Error provisioning mute role for new channel: {str(e)}")
+
 # Track reaction changes for polls
 @client.event
 async def on_raw_reaction_add(payload):
@@ -610,10 +1067,40 @@ async def on_error(event, *args, **kwargs):
     except Exception as e:
         print(f"Error in error handler: {str(e)}")
 
+async def close_async_resources() -> None:
+    """Release resources that need the event loop, before the client disconnects"""
+    await mod_log.close()
+    # Only present if a card was rendered (or preloaded) during this run
+    if "welcome_card" in sys.modules:
+        await sys.modules["welcome_card"].close_session()
+
+async def run_bot() -> None:
+    """Equivalent of client.run, with async cleanup while the loop and connection are still up"""
+    async with client:
+        try:
+            await client.start(TOKEN)
+        finally:
+            await close_async_resources()
+
 # Main entry point
 def main() -> None:
+    startup_timings["imports"] = time.perf_counter() - STARTUP_BEGAN
+    
+    # Restore state before connecting so on_ready sees a warm bot
+    phase_started = time.perf_counter()
+    restored = state_snapshot.restore()
+    if restored:
+        print(f"Restored {restored} state sections from {state_snapshot.data_file}.")
+    startup_timings["state restore"] = time.perf_counter() - phase_started
+    
+    global connect_began
+    connect_began = time.perf_counter()
+
     try:
-        client.run(TOKEN)
+        discord.utils.setup_logging()
+        asyncio.run(run_bot())
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
         print(f"Failed to start the bot: {str(e)}")
         
@@ -625,6 +1112,14 @@ def main() -> None:
         elif "privileged intent" in str(e).lower():
             print("ERROR: You need to enable privileged intents in the Discord Developer Portal")
             print("Visit: https://discord.com/developers/applications")
+    finally:
+        # Graceful shutdown: checkpoint whatever state we have
+        state_snapshot.save()
+        guild_config.save_config()
+        custom_commands.flush_uses()
+        # Only present if a card was rendered (or preloaded) during this run
+        if "welcome_card" in sys.modules:
+            sys.modules["welcome_card"].renderer.shutdown()
 
 if __name__ == '__main__': 
     main()
\ No newline at end of file
@@ -1,61 +1,387 @@
 from discord import Member, TextChannel, Embed, Permissions
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Set, Callable, Awaitable, Iterable, Union
+import os
 import datetime
 import asyncio
+import heapq
+import time
 import discord
 
-# Store muted users and their original roles
+# Discord caps native member timeouts at 28 days
+MAX_TIMEOUT_MINUTES = 28 * 24 * 60
+
+# Mute role provisioning: parallel channel edits and the pause after each one
+PROVISION_CONCURRENCY = int(os.getenv("MUTE_PROVISION_CONCURRENCY", "4"))
+PROVISION_PACING = float(os.getenv("MUTE_PROVISION_PACING", "0.25"))
+
+# Purging: how far back to scan per channel, channels purged at once, and the pause between single deletes
+PURGE_WINDOW = int(os.getenv("PURGE_WINDOW", "5000"))
+PURGE_CONCURRENCY = int(os.getenv("PURGE_CONCURRENCY", "3"))
+PURGE_SINGLE_DELETE_PACING = float(os.getenv("PURGE_SINGLE_DELETE_PACING", "1.0"))
+PURGE_SINGLE_PROGRESS_EVERY = 10  # Report progress every this many single deletes, like each bulk chunk does
+
+# Bulk ban/kick: parallel requests and the pause after each one when the bulk ban endpoint can't be used
+BULK_ACTION_CONCURRENCY = int(os.getenv("MOD_BULK_CONCURRENCY", "4"))
+BULK_ACTION_PACING = float(os.getenv("MOD_BULK_PACING", "0.5"))
+# Discord's bulk ban endpoint takes at most 200 users per call
+BULK_BAN_CHUNK = 200
+
+# Bulk delete only accepts messages younger than 14 days; keep a margin for clock skew
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+BULK_DELETE_CHUNK = 100
+
+# Store muted users and their original roles, keyed by (guild_id, member_id) since roles belong to one guild
 muted_users = {}
 
-async def clear_messages(channel: TextChannel, limit: int = 100, user: Optional[Member] = None) -> int:
-    """Clear messages from a channel, optionally filtered by user"""
+def dump_muted_users() -> dict:
+    """Snapshot muted users as plain role IDs"""
+    return {key: [role.id for role in roles] for key, roles in muted_users.items()}
+
+def restore_muted_users(data: dict) -> None:
+    """Restore muted users from a snapshot, roles come back as bare snowflakes"""
+    muted_users.clear()
+    for key, role_ids in data.items():
+        # Older snapshots were keyed by member ID alone and can't be matched to a guild
+        if isinstance(key, tuple):
+            muted_users[key] = [discord.Object(id=role_id) for role_id in role_ids]
+
+class PurgeProgress:
+    """Running totals of a purge, handed to the progress callback"""
+    __slots__ = ("channels_total", "channels_done", "scanned", "deleted")
+
+    def __init__(self, channels_total: int = 1):
+        self.channels_total = channels_total
+        self.channels_done = 0
+        self.scanned = 0
+        self.deleted = 0
+
+ProgressCallback = Callable[[PurgeProgress], Awaitable[None]]
+
+async def _bulk_delete(channel: TextChannel, messages: List[discord.Message]) -> int:
+    try:
+        await channel.delete_messages(messages)
+        return len(messages)
+    except discord.NotFound:
+        # Some were already gone; fall back to deleting what's left one by one
+        deleted = 0
+        for msg in messages:
+            try:
+                await msg.delete()
+                deleted += 1
+            except discord.NotFound:
+                pass
+        return deleted
+
+async def purge_channel(
+    channel: TextChannel,
+    user: Optional[Member] = None,
+    limit: Optional[int] = None,
+    window: int = PURGE_WINDOW,
+    progress: Optional[PurgeProgress] = None,
+    on_progress: Optional[ProgressCallback] = None
+) -> int:
+    """Delete messages from a channel, scanning up to ``window`` messages of history.
+
+    Only messages from ``user`` are deleted when given, and at most ``limit``
+    of them. Messages younger than 14 days are bulk-deleted in chunks of
+    100; older ones must be deleted one at a time and are paced.
+    """
+    progress = progress or PurgeProgress()
+    cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+    chunk: List[discord.Message] = []
+    old_messages: List[discord.Message] = []
+    matched = 0
+
+    async for msg in channel.history(limit=window):
+        progress.scanned += 1
+        if user is None or msg.author.id == user.id:
+            if msg.created_at > cutoff:
+                chunk.append(msg)
+            else:
+                old_messages.append(msg)
+            matched += 1
+
+        if len(chunk) == BULK_DELETE_CHUNK:
+            progress.deleted += await _bulk_delete(channel, chunk)
+            chunk = []
+            if on_progress:
+                await on_progress(progress)
+        if limit is not None and matched >= limit:
+            break
+
+    if chunk:
+        progress.deleted += await _bulk_delete(channel, chunk)
+        if on_progress:
+            await on_progress(progress)
+
+    for done, msg in enumerate(old_messages, 1):
+        try:
+            await msg.delete()
+            progress.deleted += 1
+        except discord.NotFound:
+            pass
+        if on_progress and (done % PURGE_SINGLE_PROGRESS_EVERY == 0 or done == len(old_messages)):
+            await on_progress(progress)
+        await asyncio.sleep(PURGE_SINGLE_DELETE_PACING)
+
+    return matched
+
+async def purge_user_in_guild(
+    guild: discord.Guild,
+    user: Member,
+    window: int = PURGE_WINDOW,
+    concurrency: int = PURGE_CONCURRENCY,
+    on_progress: Optional[ProgressCallback] = None
+) -> PurgeProgress:
+    """Purge a user's messages from every text channel of a guild, a few channels at a time"""
+    me = guild.me
+    channels = [channel for channel in guild.text_channels
+                if channel.permissions_for(me).read_message_history and channel.permissions_for(me).manage_messages]
+    progress = PurgeProgress(len(channels))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def purge_one(channel: TextChannel) -> None:
+        async with semaphore:
+            try:
+                await purge_channel(channel, user=user, window=window, progress=progress, on_progress=on_progress)
+            except discord.HTTPException as e:
+                print(f"Error purging {channel.id}: {str(e)}")
+            progress.channels_done += 1
+            if on_progress:
+                await on_progress(progress)
+
+    await asyncio.gather(*(purge_one(channel) for channel in channels))
+    return progress
+
+async def clear_messages(channel: TextChannel, limit: int = 100, user: Optional[Member] = None,
+                         on_progress: Optional[ProgressCallback] = None) -> int:
+    """Clear messages from a channel, optionally filtered by user.
+
+    Without a user the last ``limit`` messages are deleted. With a user, up
+    to ``limit`` of their messages are deleted from the last PURGE_WINDOW
+    messages, so a spammer can't hide behind other people's chatter.
+    """
+    progress = PurgeProgress()
     if user:
-        # Delete messages from specific user
-        def check(msg):
-            return msg.author.id == user.id
-            
-        deleted = await channel.purge(limit=limit, check=check)
+        await purge_channel(channel, user=user, limit=limit, progress=progress, on_progress=on_progress)
     else:
-        # Delete all messages
-        deleted = await channel.purge(limit=limit)
-        
-    return len(deleted)
+        await purge_channel(channel, window=limit, progress=progress, on_progress=on_progress)
+    return progress.deleted
+
+class MuteScheduler:
+    """Persisted heap of pending role-based unmutes.
+
+    A single task sleeps until the earliest deadline, so thousands of
+    concurrent mutes cost one coroutine rather than one each. Entries are
+    keyed by (guild, member); rescheduling or cancelling just updates the
+    index and stale heap entries are skipped when they surface.
+    """
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, int]] = []
+        self.deadlines: Dict[Tuple[int, int], float] = {}
+        self.client: Optional[discord.Client] = None
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+
+    def schedule(self, guild_id: int, member_id: int, deadline: float) -> None:
+        """Unmute a member at ``deadline`` (a time.time() timestamp)"""
+        self.deadlines[(guild_id, member_id)] = deadline
+        heapq.heappush(self.heap, (deadline, guild_id, member_id))
+        # Wake the runner if this is now the earliest deadline
+        if self.wakeup is not None and self.heap[0][0] == deadline:
+            self.wakeup.set()
+
+    def cancel(self, guild_id: int, member_id: int) -> None:
+        self.deadlines.pop((guild_id, member_id), None)
+
+    def dump(self) -> List[Tuple[float, int, int]]:
+        """Snapshot pending unmutes for the state checkpoint"""
+        return [(deadline, guild_id, member_id) for (guild_id, member_id), deadline in self.deadlines.items()]
+
+    def restore(self, data: List[Tuple[float, int, int]]) -> None:
+        self.deadlines = {(guild_id, member_id): deadline for deadline, guild_id, member_id in data}
+        self.heap = [(deadline, guild_id, member_id) for (guild_id, member_id), deadline in self.deadlines.items()]
+        heapq.heapify(self.heap)
+
+    def start(self, client: discord.Client) -> None:
+        """Start the expiry task; overdue unmutes restored from a snapshot fire right away"""
+        self.client = client
+        if self.task is None or self.task.done():
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def _pop_due(self, now: float) -> List[Tuple[int, int]]:
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            deadline, guild_id, member_id = heapq.heappop(self.heap)
+            if self.deadlines.get((guild_id, member_id)) == deadline:
+                del self.deadlines[(guild_id, member_id)]
+                due.append((guild_id, member_id))
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            self.wakeup.clear()
+            for guild_id, member_id in self._pop_due(time.time()):
+                await self._expire(guild_id, member_id)
+
+            timeout = self.heap[0][0] - time.time() if self.heap else None
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _expire(self, guild_id: int, member_id: int) -> None:
+        guild = self.client.get_guild(guild_id) if self.client else None
+        if guild is None:
+            return
+        try:
+            member = guild.get_member(member_id) or await guild.fetch_member(member_id)
+            await unmute_user(member)
+        except discord.NotFound:
+            # Member left; nothing to restore
+            muted_users.pop((guild_id, member_id), None)
+        except Exception as e:
+            print(f"Error expiring mute for {member_id} in {guild_id}: {str(e)}")
+
+mute_scheduler = MuteScheduler()
+
+class MuteRoleProvisioner:
+    """Applies the Muted role's channel overwrites as a background job.
+
+    Channels are patched with bounded concurrency and pacing, backing off on
+    rate limits. Finished channels are remembered per guild (and persisted in
+    the state snapshot), so the job is idempotent and resumes where it left
+    off after a restart. New channels are patched one at a time as they are
+    created.
+    """
+
+    def __init__(self, concurrency: int = PROVISION_CONCURRENCY, pacing: float = PROVISION_PACING):
+        self.concurrency = concurrency
+        self.pacing = pacing
+        # guild_id -> (mute role id, channel ids already patched for that role)
+        self.provisioned: Dict[int, Tuple[int, Set[int]]] = {}
+        self.jobs: Dict[int, asyncio.Task] = {}
+
+    def dump(self) -> Dict[int, Tuple[int, List[int]]]:
+        return {guild_id: (role_id, list(channels)) for guild_id, (role_id, channels) in self.provisioned.items()}
+
+    def restore(self, data: Dict[int, Tuple[int, List[int]]]) -> None:
+        self.provisioned = {guild_id: (role_id, set(channels)) for guild_id, (role_id, channels) in data.items()}
+
+    def _done(self, guild_id: int, role_id: int) -> Set[int]:
+        entry = self.provisioned.get(guild_id)
+        if entry is None or entry[0] != role_id:
+            # New (or recreated) role: nothing is provisioned for it yet
+            entry = self.provisioned[guild_id] = (role_id, set())
+        return entry[1]
+
+    def ensure(self, guild: discord.Guild, role: discord.Role) -> Optional[asyncio.Task]:
+        """Start provisioning any unpatched channels, unless a job is already running"""
+        job = self.jobs.get(guild.id)
+        if job is not None and not job.done():
+            return job
+        done = self._done(guild.id, role.id)
+        pending = [channel for channel in guild.channels if channel.id not in done]
+        if not pending:
+            return None
+        job = self.jobs[guild.id] = asyncio.get_running_loop().create_task(self._provision(guild, role, pending))
+        return job
+
+    async def _provision(self, guild: discord.Guild, role: discord.Role, channels: List[discord.abc.GuildChannel]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._patch(semaphore, channel, role) for channel in channels))
+        print(f"Provisioned mute role in {sum(results)}/{len(channels)} channels of {guild.id} "
+              f"in {time.perf_counter() - started:.1f}s")
+
+    async def patch_channel(self, channel: discord.abc.GuildChannel) -> bool:
+        """Patch a single (usually just created) channel if the guild has a Muted role"""
+        role = discord.utils.get(channel.guild.roles, name="Muted")
+        if role is None:
+            return False
+        return await self._patch(asyncio.Semaphore(1), channel, role)
+
+    async def _patch(self, semaphore: asyncio.Semaphore, channel: discord.abc.GuildChannel, role: discord.Role) -> bool:
+        done = self._done(channel.guild.id, role.id)
+        async with semaphore:
+            # Idempotent: skip channels that already deny what a mute needs
+            overwrite = channel.overwrites_for(role)
+            if overwrite.send_messages is False and overwrite.add_reactions is False and overwrite.speak is False:
+                done.add(channel.id)
+                return True
+            
+            for attempt in range(5):
+                try:
+                    await channel.set_permissions(
+                        role,
+                        send_messages=False,
+                        add_reactions=False,
+                        speak=False,
+                        reason="Provisioning mute role"
+                    )
+                    done.add(channel.id)
+                    await asyncio.sleep(self.pacing)
+                    return True
+                except discord.RateLimited as e:
+                    await asyncio.sleep(e.retry_after)
+                except discord.HTTPException as e:
+                    if e.status == 429 or e.status >= 500:
+                        await asyncio.sleep(getattr(e, "retry_after", None) or 2 ** attempt)
+                        continue
+                    print(f"Could not provision mute role in {channel.id}: {str(e)}")
+                    return False
+            return False
+
+role_provisioner = MuteRoleProvisioner()
 
 async def mute_user(member: Member, minutes: int = 10, reason: str = "No reason provided") -> bool:
-    """Mute a user for a specified time"""
+    """Mute a user for a specified time (0 minutes means until unmuted).
+
+    Prefers Discord's native member timeout, which needs no role edits and
+    expires on Discord's side. Falls back to the Muted role when the bot
+    can't moderate members or the mute is indefinite or longer than 28 days;
+    the role-based unmute is queued on the mute scheduler.
+    """
+    permissions = member.guild.me.guild_permissions
+    
+    if 0 < minutes <= MAX_TIMEOUT_MINUTES and permissions.moderate_members:
+        try:
+            await member.timeout(datetime.timedelta(minutes=minutes), reason=reason)
+            return True
+        except discord.HTTPException as e:
+            print(f"Native timeout failed for {member.id}, falling back to mute role: {str(e)}")
+    
     # Check if the bot has permission to manage roles
-    if not member.guild.me.guild_permissions.manage_roles:
+    if not permissions.manage_roles:
         return False
         
     # Look for mute role or create one
     mute_role = discord.utils.get(member.guild.roles, name="Muted")
     if not mute_role:
         try:
-            # Create mute role with proper permissions
             mute_role = await member.guild.create_role(name="Muted", reason="Created for muting users")
-            
-            # Set permissions for all channels
-            for channel in member.guild.channels:
-                await channel.set_permissions(
-                    mute_role,
-                    send_messages=False,
-                    add_reactions=False,
-                    speak=False
-                )
         except:
             return False
     
+    # Channel overwrites are applied in the background; the mute itself doesn't wait
+    role_provisioner.ensure(member.guild, mute_role)
+    
     try:
-        # Store current roles
-        muted_users[member.id] = [role for role in member.roles if role != member.guild.default_role]
+        # Store current roles (unless already muted, so a re-mute keeps the originals)
+        key = (member.guild.id, member.id)
+        if key not in muted_users:
+            muted_users[key] = [role for role in member.roles if role != member.guild.default_role]
         
         # Remove roles and add mute role
         await member.edit(roles=[mute_role], reason=reason)
         
         # Schedule unmute
         if minutes > 0:
-            await asyncio.sleep(minutes * 60)
-            await unmute_user(member)
+            mute_scheduler.schedule(member.guild.id, member.id, time.time() + minutes * 60)
+        else:
+            mute_scheduler.cancel(member.guild.id, member.id)
             
         return True
     except:
@@ -63,11 +389,16 @@ async def mute_user(member: Member, minutes: int = 10, reason: str = "No reason
 
 async def unmute_user(member: Member) -> bool:
     """Unmute a previously muted user"""
+    mute_scheduler.cancel(member.guild.id, member.id)
     try:
-        if member.id in muted_users:
+        if member.is_timed_out():
+            await member.timeout(None)
+        
+        key = (member.guild.id, member.id)
+        if key in muted_users:
             # Restore original roles
-            await member.edit(roles=muted_users[member.id])
-            del muted_users[member.id]
+            await member.edit(roles=muted_users[key])
+            del muted_users[key]
             return True
         else:
             # Just remove the mute role
@@ -83,7 +414,8 @@ async def kick_user(member: Member, reason: str = "No reason provided") -> bool:
     try:
         await member.kick(reason=reason)
         return True
-    except:
+    except discord.HTTPException as e:
+        print(f"Error kicking {member.id}: {str(e)}")
         return False
 
 async def ban_user(member: Member, delete_days: int = 1, reason: str = "No reason provided") -> bool:
@@ -91,12 +423,175 @@ async def ban_user(member: Member, delete_days: int = 1, reason: str = "No reaso
     try:
         await member.ban(delete_message_days=delete_days, reason=reason)
         return True
-    except:
+    except discord.HTTPException as e:
+        print(f"Error banning {member.id}: {str(e)}")
         return False
 
-def create_mod_log(action: str, mod: Member, target: Member, reason: str) -> Embed:
+class BulkResult:
+    """Per-target outcome of a bulk ban or kick, plus throughput"""
+    __slots__ = ("action", "total", "succeeded", "failed", "started", "finished", "used_bulk_endpoint")
+
+    def __init__(self, action: str, total: int):
+        self.action = action
+        self.total = total
+        self.succeeded: List[int] = []
+        # target id -> error text
+        self.failed: Dict[int, str] = {}
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.used_bulk_endpoint = False
+
+    @property
+    def done(self) -> int:
+        return len(self.succeeded) + len(self.failed)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def per_second(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.action}: {len(self.succeeded)}/{self.total} succeeded, {len(self.failed)} failed "
+                f"in {self.elapsed:.1f}s ({self.per_second:.1f}/s)")
+
+BulkProgressCallback = Callable[[BulkResult], Awaitable[None]]
+BulkTarget = Union[discord.abc.Snowflake, int]
+
+def _as_snowflakes(targets: Iterable[BulkTarget]) -> List[discord.abc.Snowflake]:
+    """Accept members, users or raw IDs; drop duplicates while keeping order"""
+    seen: Dict[int, discord.abc.Snowflake] = {}
+    for target in targets:
+        if isinstance(target, int):
+            target = discord.Object(id=target)
+        seen.setdefault(target.id, target)
+    return list(seen.values())
+
+async def _each_target(
+    targets: List[discord.abc.Snowflake],
+    result: BulkResult,
+    action: Callable[[discord.abc.Snowflake], Awaitable[None]],
+    concurrency: int,
+    pacing: float,
+    on_progress: Optional[BulkProgressCallback]
+) -> None:
+    """Run one request per target, a few at a time with a pause after each"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(target: discord.abc.Snowflake) -> None:
+        async with semaphore:
+            try:
+                await action(target)
+                result.succeeded.append(target.id)
+            except discord.HTTPException as e:
+                result.failed[target.id] = str(e)
+            if on_progress:
+                await on_progress(result)
+            await asyncio.sleep(pacing)
+
+    await asyncio.gather(*(run_one(target) for target in targets))
+
+async def bulk_ban(
+    guild: discord.Guild,
+    targets: Iterable[BulkTarget],
+    reason: str = "No reason provided",
+    delete_message_seconds: int = 86400,
+    concurrency: int = BULK_ACTION_CONCURRENCY,
+    pacing: float = BULK_ACTION_PACING,
+    on_progress: Optional[BulkProgressCallback] = None
+) -> BulkResult:
+    """Ban many members or user IDs at once.
+
+    Uses Discord's bulk ban endpoint (200 users per call) when the library
+    and the bot's permissions allow it, otherwise falls back to individual
+    bans with bounded concurrency.
+    """
+    targets = _as_snowflakes(targets)
+    result = BulkResult("ban", len(targets))
+    remaining = targets
+
+    # The bulk endpoint needs discord.py 2.4+ and Manage Server on top of Ban Members
+    if hasattr(guild, "bulk_ban") and guild.me.guild_permissions.manage_guild:
+        remaining = []
+        for start in range(0, len(targets), BULK_BAN_CHUNK):
+            chunk = targets[start:start + BULK_BAN_CHUNK]
+            try:
+                response = await guild.bulk_ban(chunk, reason=reason, delete_message_seconds=delete_message_seconds)
+            except discord.HTTPException as e:
+                print(f"Bulk ban failed in {guild.id}, falling back to single bans: {str(e)}")
+                remaining.extend(chunk)
+                continue
+            result.used_bulk_endpoint = True
+            result.succeeded.extend(user.id for user in response.banned)
+            for user in response.failed:
+                result.failed[user.id] = "Rejected by bulk ban"
+            if on_progress:
+                await on_progress(result)
+
+    if remaining:
+        async def ban_one(target: discord.abc.Snowflake) -> None:
+            await guild.ban(target, reason=reason, delete_message_seconds=delete_message_seconds)
+
+        await _each_target(remaining, result, ban_one, concurrency, pacing, on_progress)
+
+    result.finished = time.monotonic()
+    return result
+
+async def bulk_kick(
+    guild: discord.Guild,
+    targets: Iterable[BulkTarget],
+    reason: str = "No reason provided",
+    concurrency: int = BULK_ACTION_CONCURRENCY,
+    pacing: float = BULK_ACTION_PACING,
+    on_progress: Optional[BulkProgressCallback] = None
+) -> BulkResult:
+    """Kick many members or user IDs with bounded concurrency (there is no bulk kick endpoint)"""
+    targets = _as_snowflakes(targets)
+    result = BulkResult("kick", len(targets))
+
+    async def kick_one(target: discord.abc.Snowflake) -> None:
+        await guild.kick(target, reason=reason)
+
+    await _each_target(targets, result, kick_one, concurrency, pacing, on_progress)
+    result.finished = time.monotonic()
+    return result
+
+def members_joined_between(
+    guild: discord.Guild,
+    start: datetime.datetime,
+    end: Optional[datetime.datetime] = None,
+    include_bots: bool = False
+) -> List[Member]:
+    """Members who joined within [start, end], for picking out a raid wave.
+
+    Staff (anyone who can manage messages), the owner and the bot itself are
+    never selected.
+    """
+    end = end or discord.utils.utcnow()
+    selected = []
+    for member in guild.members:
+        if member.joined_at is None or not (start <= member.joined_at <= end):
+            continue
+        if member.id in (guild.owner_id, guild.me.id) or member.guild_permissions.manage_messages:
+            continue
+        if member.bot and not include_bots:
+            continue
+        selected.append(member)
+    selected.sort(key=lambda member: member.joined_at)
+    return selected
+
+def recent_joins(guild: discord.Guild, minutes: int, include_bots: bool = False) -> List[Member]:
+    """Members who joined in the last ``minutes`` minutes"""
+    return members_joined_between(guild, discord.utils.utcnow() - datetime.timedelta(minutes=minutes),
+                                  include_bots=include_bots)
+
+def create_mod_log(action: str, mod: Member, target: Optional[Member], reason: str,
+                   case_number: Optional[int] = None, details: Optional[str] = None) -> Embed:
     """Create a moderation log embed"""
     colors = {
+        "warn": 0xf1c40f,    # Yellow
         "mute": 0xf39c12,   # Orange
         "unmute": 0x2ecc71,  # Green
         "kick": 0xe74c3c,    # Red
@@ -111,7 +606,12 @@ def create_mod_log(action: str, mod: Member, target: Member, reason: str) -> Emb
     )
     
     embed.add_field(name="Moderator", value=f"{mod.mention} ({mod.id})", inline=False)
-    embed.add_field(name="Target User", value=f"{target.mention} ({target.id})", inline=False)
+    if target is not None:
+        embed.add_field(name="Target User", value=f"{target.mention} ({target.id})", inline=False)
     embed.add_field(name="Reason", value=reason or "No reason provided", inline=False)
+    if details:
+        embed.add_field(name="Details", value=details, inline=False)
+    if case_number is not None:
+        embed.set_footer(text=f"Case #{case_number}")
     
     return embed
@@ -0,0 +1,247 @@
+from typing import Dict, List, Optional, Any, Tuple
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import discord
+from moderation import create_mod_log
+
+# Discord accepts up to 10 embeds and 6000 embed characters per message
+EMBEDS_PER_MESSAGE = 10
+EMBED_CHARS_PER_MESSAGE = 6000
+
+# How long to gather log embeds before sending, so a burst of actions goes out as a few messages
+LOG_BATCH_DELAY = float(os.getenv("MOD_LOG_BATCH_DELAY", "1.0"))
+
+CASE_COLUMNS = ("case_number", "action", "target_id", "moderator_id", "reason", "details", "created_at")
+
+class CaseStore:
+    """SQLite history of moderation actions.
+
+    Cases are numbered per guild. Secondary indexes cover lookups by
+    target, by moderator and by time, each served newest (highest case
+    number) first; batches recorded together share a timestamp, so the
+    case number is the only unambiguous order.
+    """
+
+    def __init__(self, db_file: str = "mod_cases.db"):
+        self.db_file = db_file
+        self._conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Opened on first use, so importing the bot doesn't create the database"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS mod_cases ("
+            "guild_id INTEGER NOT NULL, case_number INTEGER NOT NULL, action TEXT NOT NULL, "
+            "target_id INTEGER, moderator_id INTEGER NOT NULL, reason TEXT, details TEXT, "
+            "created_at REAL NOT NULL, PRIMARY KEY (guild_id, case_number)) WITHOUT ROWID"
+        )
+        # Superseded by the case-number indexes below
+        conn.execute("DROP INDEX IF EXISTS mod_cases_target")
+        conn.execute("DROP INDEX IF EXISTS mod_cases_moderator")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS mod_cases_target_case ON mod_cases (guild_id, target_id, case_number)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS mod_cases_moderator_case ON mod_cases (guild_id, moderator_id, case_number)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS mod_cases_time ON mod_cases (guild_id, created_at)")
+        conn.commit()
+        return conn
+
+    def add(self, guild_id: int, action: str, target_id: Optional[int], moderator_id: int,
+            reason: Optional[str] = None, details: Optional[str] = None) -> int:
+        """Record a case and return its per-guild number"""
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT COALESCE(MAX(case_number), 0) + 1 FROM mod_cases WHERE guild_id = ?", (guild_id,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT INTO mod_cases (guild_id, case_number, action, target_id, moderator_id, reason, details, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, row[0], action, target_id, moderator_id, reason, details, time.time())
+            )
+        return row[0]
+
+    def add_many(self, guild_id: int, action: str, target_ids: List[int], moderator_id: int,
+                 reason: Optional[str] = None, details: Optional[str] = None) -> List[int]:
+        """Record one case per target in a single transaction; returns their numbers"""
+        if not target_ids:
+            return []
+        now = time.time()
+        with self.lock, self.conn:
+            first = self.conn.execute(
+                "SELECT COALESCE(MAX(case_number), 0) + 1 FROM mod_cases WHERE guild_id = ?", (guild_id,)
+            ).fetchone()[0]
+            numbers = list(range(first, first + len(target_ids)))
+            self.conn.executemany(
+                "INSERT INTO mod_cases (guild_id, case_number, action, target_id, moderator_id, reason, details, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(guild_id, number, action, target_id, moderator_id, reason, details, now)
+                 for number, target_id in zip(numbers, target_ids)]
+            )
+        return numbers
+
+    def _select(self, where: str, params: Tuple, limit: int, offset: int) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT {', '.join(CASE_COLUMNS)} FROM mod_cases WHERE {where} "
+                "ORDER BY case_number DESC LIMIT ? OFFSET ?",
+                params + (limit, offset)
+            ).fetchall()
+        return [dict(zip(CASE_COLUMNS, row)) for row in rows]
+
+    def _count(self, where: str, params: Tuple) -> int:
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM mod_cases WHERE {where}", params).fetchone()[0]
+
+    def get(self, guild_id: int, case_number: int) -> Optional[Dict[str, Any]]:
+        cases = self._select("guild_id = ? AND case_number = ?", (guild_id, case_number), 1, 0)
+        return cases[0] if cases else None
+
+    def for_target(self, guild_id: int, target_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        return self._select("guild_id = ? AND target_id = ?", (guild_id, target_id), limit, offset)
+
+    def for_moderator(self, guild_id: int, moderator_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        return self._select("guild_id = ? AND moderator_id = ?", (guild_id, moderator_id), limit, offset)
+
+    def recent(self, guild_id: int, limit: int = 10, offset: int = 0, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        if since is None:
+            return self._select("guild_id = ?", (guild_id,), limit, offset)
+        return self._select("guild_id = ? AND created_at >= ?", (guild_id, since), limit, offset)
+
+    def count_for_target(self, guild_id: int, target_id: int) -> int:
+        return self._count("guild_id = ? AND target_id = ?", (guild_id, target_id))
+
+    def count(self, guild_id: int) -> int:
+        return self._count("guild_id = ?", (guild_id,))
+
+    def close(self) -> None:
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+class LogQueue:
+    """Coalesces log embeds per channel and sends them in packed messages.
+
+    The first embed starts a short gather window; everything queued by then
+    goes out as messages of up to 10 embeds, so a mod storm costs a handful
+    of sends instead of one per action.
+    """
+
+    def __init__(self, delay: float = LOG_BATCH_DELAY):
+        self.delay = delay
+        # channel_id -> (channel, queued embeds)
+        self.pending: Dict[int, Tuple[discord.abc.Messageable, List[discord.Embed]]] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.sending = False  # The task is past its gather window
+        self.sent_messages = 0
+        self.sent_embeds = 0
+
+    def put(self, channel: discord.abc.Messageable, embed: discord.Embed) -> None:
+        self.pending.setdefault(channel.id, (channel, []))[1].append(embed)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self) -> None:
+        await asyncio.sleep(self.delay)
+        self.sending = True
+        try:
+            await self._send_pending()
+        finally:
+            self.sending = False
+
+    async def flush(self) -> None:
+        """Send everything queued now instead of waiting out the gather window"""
+        task = self.task
+        if task is not None and not task.done():
+            if self.sending:
+                await task
+            else:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        await self._send_pending()
+
+    async def _send_pending(self) -> None:
+        # Embeds queued while we are sending get picked up on the next pass
+        while self.pending:
+            batches, self.pending = self.pending, {}
+            for channel, embeds in batches.values():
+                for chunk in self._pack(embeds):
+                    try:
+                        await channel.send(embeds=chunk)
+                        self.sent_messages += 1
+                        self.sent_embeds += len(chunk)
+                    except discord.HTTPException as e:
+                        print(f"Error sending moderation log to {channel.id}: {str(e)}")
+
+    @staticmethod
+    def _pack(embeds: List[discord.Embed]) -> List[List[discord.Embed]]:
+        """Split embeds into messages within Discord's count and size limits"""
+        chunks: List[List[discord.Embed]] = []
+        chunk: List[discord.Embed] = []
+        size = 0
+        for embed in embeds:
+            length = len(embed)
+            if chunk and (len(chunk) == EMBEDS_PER_MESSAGE or size + length > EMBED_CHARS_PER_MESSAGE):
+                chunks.append(chunk)
+                chunk, size = [], 0
+            chunk.append(embed)
+            size += length
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+class ModLog:
+    """Records moderation cases and mirrors them to the guild's log channel"""
+
+    def __init__(self, db_file: str = "mod_cases.db"):
+        self.store = CaseStore(db_file)
+        self.queue = LogQueue()
+
+    def record(self, guild: discord.Guild, action: str, target: Optional[discord.abc.User], moderator: discord.abc.User,
+               reason: Optional[str], settings, details: Optional[str] = None) -> int:
+        """Store a case and queue its log embed if logging is enabled; returns the case number"""
+        case_number = self.store.add(guild.id, action, target.id if target else None, moderator.id, reason, details)
+
+        if settings.log_enabled and settings.log_channel:
+            channel = guild.get_channel(int(settings.log_channel))
+            if channel is not None:
+                self.queue.put(channel, create_mod_log(action, moderator, target, reason, case_number, details))
+        return case_number
+
+    def record_many(self, guild: discord.Guild, action: str, target_ids: List[int], moderator: discord.abc.User,
+                    reason: Optional[str], settings, details: Optional[str] = None) -> List[int]:
+        """Store a case per target but log a single summary embed for the whole batch"""
+        case_numbers = self.store.add_many(guild.id, action, target_ids, moderator.id, reason, details)
+
+        if case_numbers and settings.log_enabled and settings.log_channel:
+            channel = guild.get_channel(int(settings.log_channel))
+            if channel is not None:
+                summary = f"{len(case_numbers)} members (cases #{case_numbers[0]}-#{case_numbers[-1]})"
+                if details:
+                    summary = f"{details}\n{summary}"
+                self.queue.put(channel, create_mod_log(action, moderator, None, reason, details=summary))
+        return case_numbers
+
+    async def close(self) -> None:
+        """Send the log embeds still queued and close the case database"""
+        await self.queue.flush()
+        self.store.close()
+
+mod_log = ModLog()
@@ -0,0 +1,154 @@
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+import math
+import time
+
+# Fallback limits when a guild doesn't configure a command: command -> scope -> [uses, per seconds].
+# "user" buckets are per (guild, user, command), "guild" buckets are shared by the whole guild.
+# "*" covers any command without its own entry. Chat replies ("respond") are only limited when a
+# guild configures them.
+DEFAULT_COOLDOWNS: Dict[str, Dict[str, List[float]]] = {
+    "!poll": {"user": [2, 60], "guild": [10, 60]},
+    "!remind": {"user": [5, 60]},
+    "respond": {},
+    "*": {"user": [20, 60]},
+}
+
+class TimingWheel:
+    """Hashed timing wheel of key expiry times.
+
+    Keys are dropped into the slot of their deadline; advancing the wheel
+    hands back the keys whose slots have passed. Rescheduling is lazy, so
+    the owner checks each returned key against its current deadline.
+    """
+
+    def __init__(self, granularity: float = 1.0, slots: int = 512):
+        self.granularity = granularity
+        self.slots: List[Set[Hashable]] = [set() for _ in range(slots)]
+        self.tick = int(time.monotonic() // granularity)
+
+    def schedule(self, key: Hashable, deadline: float) -> None:
+        # Deadlines past the wheel's horizon land in the furthest slot and get rescheduled from there
+        target = min(max(int(deadline // self.granularity), self.tick + 1), self.tick + len(self.slots) - 1)
+        self.slots[target % len(self.slots)].add(key)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Move the wheel up to now; returns the keys from every slot passed"""
+        current = int(now // self.granularity)
+        due: List[Hashable] = []
+        steps = min(current - self.tick, len(self.slots))
+        for tick in range(self.tick + 1, self.tick + 1 + steps):
+            slot = self.slots[tick % len(self.slots)]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+        self.tick = max(self.tick, current)
+        return due
+
+class RateLimiter:
+    """Token buckets that exist only while they are below capacity.
+
+    A bucket is (tokens, updated_at) and is forgotten once it would have
+    refilled completely, at which point it is indistinguishable from a new
+    one; idle keys therefore cost nothing.
+    """
+
+    def __init__(self, granularity: float = 1.0, slots: int = 512):
+        # key -> (tokens, updated_at, time it is full again)
+        self.buckets: Dict[Hashable, Tuple[float, float, float]] = {}
+        self.wheel = TimingWheel(granularity, slots)
+
+    def _expire(self, now: float) -> None:
+        for key in self.wheel.advance(now):
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            if bucket[2] <= now:
+                del self.buckets[key]
+            else:
+                self.wheel.schedule(key, bucket[2])
+
+    def _tokens(self, key: Hashable, capacity: float, rate: float, now: float) -> float:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return capacity
+        tokens, updated_at, _ = bucket
+        return min(capacity, tokens + (now - updated_at) * rate)
+
+    def retry_after(self, key: Hashable, uses: float, per: float, now: Optional[float] = None) -> float:
+        """Seconds until key may act again (0 if it may act now), without using a token"""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        rate = uses / per
+        tokens = self._tokens(key, uses, rate, now)
+        return 0.0 if tokens >= 1 else (1 - tokens) / rate
+
+    def consume(self, key: Hashable, uses: float, per: float, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        rate = uses / per
+        tokens = self._tokens(key, uses, rate, now) - 1
+        full_at = now + (uses - tokens) / rate
+        if key not in self.buckets:
+            self.wheel.schedule(key, full_at)
+        self.buckets[key] = (tokens, now, full_at)
+
+    def hit(self, key: Hashable, uses: float, per: float, now: Optional[float] = None) -> float:
+        """Use a token if one is available; returns 0 on success, otherwise seconds to wait"""
+        now = time.monotonic() if now is None else now
+        wait = self.retry_after(key, uses, per, now)
+        if not wait:
+            self.consume(key, uses, per, now)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+class CommandLimiter:
+    """Per-user and per-guild cooldowns for commands, resolved from guild settings"""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None):
+        self.limiter = limiter or RateLimiter()
+
+    @staticmethod
+    def limits(settings, command: str) -> Tuple[str, Dict[str, List[float]]]:
+        """(name the limits are filed under, limits): command itself, or "*" for commands without an entry"""
+        configured = settings.command_cooldowns or {}
+        for name in (command, "*"):
+            if name in configured:
+                return name, configured[name] or {}
+            if name in DEFAULT_COOLDOWNS:
+                return name, DEFAULT_COOLDOWNS[name]
+        return command, {}
+
+    def check(self, settings, guild_id: Optional[int], user_id: int, command: str) -> float:
+        """Take a use of command for this user; returns 0 if allowed, otherwise seconds until it is.
+
+        guild_id is None for DMs, which only have per-user buckets.
+        """
+        # Commands covered by "*" share one bucket, so varying the command text doesn't get around it
+        name, limits = self.limits(settings, command)
+        buckets = []
+        if "user" in limits:
+            buckets.append(((guild_id or 0, user_id, name), limits["user"]))
+        if "guild" in limits and guild_id is not None:
+            buckets.append(((guild_id, 0, name), limits["guild"]))
+        if not buckets:
+            return 0.0
+
+        now = time.monotonic()
+        # Only spend tokens when every bucket allows it, so a refused user doesn't drain the guild's share
+        wait = max(self.limiter.retry_after(key, uses, per, now) for key, (uses, per) in buckets)
+        if wait:
+            return wait
+        for key, (uses, per) in buckets:
+            self.limiter.consume(key, uses, per, now)
+        return 0.0
+
+    def should_notify(self, guild_id: int, user_id: int, every: float = 10.0) -> bool:
+        """Rate limit the "slow down" replies themselves to one per user every few seconds"""
+        return not self.limiter.hit((guild_id, user_id, "notice"), 1, every)
+
+def format_wait(seconds: float) -> str:
+    seconds = math.ceil(seconds)
+    return f"{seconds}s" if seconds < 60 else f"{seconds // 60}m {seconds % 60}s"
+
+command_limiter = CommandLimiter()
@@ -1,23 +1,106 @@
 import httpx
+import os
 from random import choice
+from typing import Awaitable, Callable, Optional
+from bloom import BloomFilter, could_match
 
-DATABASE_SERVICE_URL = "http://localhost:8000/respond"
+DATABASE_SERVICE_URL = os.getenv("DATABASE_SERVICE_URL", "http://localhost:8000/respond")
+SERVICE_TIMEOUT = float(os.getenv("DATABASE_SERVICE_TIMEOUT", "5.0"))
 
-async def get_response(user_input: str) -> str:
+# Local trigger prefilter: messages that can't match any trigger skip the service call.
+# Mode "fallback" answers them with a fallback line (what the service's 404 leads to anyway), "ignore" stays quiet.
+PREFILTER_ENABLED = os.getenv("RESPONSE_PREFILTER", "1") == "1"
+PREFILTER_MODE = os.getenv("RESPONSE_PREFILTER_MODE", "fallback")
+PREFILTER_FP_RATE = float(os.getenv("RESPONSE_PREFILTER_FP_RATE", "0.01"))
+PREFILTER_URL = os.getenv("RESPONSE_PREFILTER_URL", DATABASE_SERVICE_URL.rsplit("/", 1)[0] + "/triggers/bloom")
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared service client, creating it on first use.
+
+    One pooled client keeps connections to the service alive instead of
+    opening a new one for every message.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=SERVICE_TIMEOUT)
+    return _client
+
+def set_client(client: Optional[httpx.AsyncClient]) -> None:
+    """Swap in a different client, e.g. one bound to an in-process ASGI app"""
+    global _client
+    _client = client
+
+async def close_client() -> None:
+    """Close the shared service client"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+class ResponsePrefilter:
+    """Bloom filter of trigger n-grams fetched from the service, used to rule out hopeless messages"""
+
+    def __init__(self, url: str = PREFILTER_URL, fp_rate: float = PREFILTER_FP_RATE):
+        self.url = url
+        self.fp_rate = fp_rate
+        self.filter: Optional[BloomFilter] = None
+        self.etag: Optional[str] = None
+        self.skipped = 0
+        self.passed = 0
+
+    async def refresh(self) -> bool:
+        """Fetch the filter if it changed; returns True when a new one was loaded"""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        try:
+            response = await get_client().get(self.url, params={"fp_rate": self.fp_rate}, headers=headers)
+            if response.status_code == 304:
+                return False
+            response.raise_for_status()
+            self.filter = BloomFilter.from_bytes(response.content)
+            self.etag = response.headers.get("ETag")
+            return True
+        except Exception as e:
+            # Keep using the filter we have (or none at all, which lets everything through)
+            print(f"Could not refresh the response prefilter: {e}")
+            return False
+
+    def should_skip(self, text: str) -> bool:
+        """True if text (lowercased) certainly matches no trigger"""
+        # LIKE wildcards make the service's match broader than a plain substring
+        if self.filter is None or any(c in text for c in "%_\\"):
+            return False
+        if could_match(self.filter, text):
+            self.passed += 1
+            return False
+        self.skipped += 1
+        return True
+
+prefilter = ResponsePrefilter()
+
+async def get_response(user_input: str, allow_lookup: Optional[Callable[[], Awaitable[bool]]] = None) -> Optional[str]:
     """
     Given user_input, query the chat responses API to find a matching response.
     If no matching response is found or an error occurs, return a default fallback message.
+    Returns None when the prefilter rules the message out and is set to ignore such messages,
+    or when allow_lookup (checked only for messages that would reach the service) returns False.
     """
     # If the input is empty, return a specific message
     if not user_input.strip():
         return "Well you're awfully silent."
     
+    if PREFILTER_ENABLED and prefilter.should_skip(user_input.lower()):
+        return None if PREFILTER_MODE == "ignore" else fallback_response()
+    
+    if allow_lookup is not None and not await allow_lookup():
+        return None
+    
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                DATABASE_SERVICE_URL,
-                params={"input_text": user_input.lower()}
-            )
+        response = await get_client().get(
+            DATABASE_SERVICE_URL,
+            params={"input_text": user_input.lower()}
+        )
         
         print(f"Response status code: {response.status_code}")
         print(f"Response content: {response.content}")
@@ -1,11 +1,15 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Response
 from sqlalchemy import create_engine, Column, Integer, String, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Optional, Tuple
 import os
+import time
+import hashlib
 from dotenv import load_dotenv
+from trigger_snapshot import TriggerSnapshot, write_snapshot, rebuild_lock
+from bloom import build_trigger_filter
 
 load_dotenv()
 
@@ -14,7 +18,12 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL is None:
     raise ValueError("No DATABASE_URL set for the application")
  
-engine = create_engine(DATABASE_URL)
+# SQLite (local runs and benchmarks) needs to be shared across FastAPI's worker threads
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+else:
+    # /respond is served from the trigger snapshot, so each worker only needs a small pool for writes
+    engine = create_engine(DATABASE_URL, pool_size=int(os.getenv("DB_POOL_SIZE", "5")))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -25,11 +34,52 @@ class ChatResponseModel(Base):
     response = Column(String(1024))
     active = Column(Boolean, default=True)
 
-Base.metadata.create_all(bind=engine)
+# Create missing tables when the app starts; set to 0 when `python service.py` runs as a separate migration step
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "1") == "1"
+
+def init_db() -> float:
+    """Create any missing tables; returns how long it took in seconds"""
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    return time.perf_counter() - started
+
+# Active triggers serialized to one file that every worker memory-maps; set TRIGGER_SNAPSHOT= to disable
+TRIGGER_SNAPSHOT_PATH = os.getenv("TRIGGER_SNAPSHOT", "trigger_snapshot.bin")
+trigger_snapshot = TriggerSnapshot(
+    TRIGGER_SNAPSHOT_PATH, check_interval=float(os.getenv("TRIGGER_SNAPSHOT_CHECK_SECONDS", "1.0"))
+) if TRIGGER_SNAPSHOT_PATH else None
+
+def rebuild_snapshot() -> int:
+    """Rewrite the trigger snapshot from the database; returns how many triggers it holds"""
+    if trigger_snapshot is None:
+        return 0
+    with rebuild_lock(TRIGGER_SNAPSHOT_PATH):
+        db = SessionLocal()
+        try:
+            rows = db.query(ChatResponseModel.id, ChatResponseModel.trigger, ChatResponseModel.response)\
+                     .filter(ChatResponseModel.active == True)\
+                     .filter(ChatResponseModel.trigger.isnot(None))\
+                     .all()
+        finally:
+            db.close()
+        count = write_snapshot(TRIGGER_SNAPSHOT_PATH, [(row_id, trigger, response or "") for row_id, trigger, response in rows])
+    # Other workers pick the new file up on their next check
+    trigger_snapshot.invalidate()
+    return count
 
 # --- FastAPI App ---
 app = FastAPI(title="Chat Bot Response Database Service")
 
+@app.on_event("startup")
+def startup() -> None:
+    """Schema setup happens here rather than at import, so importing the module stays cheap"""
+    if DB_INIT_ON_STARTUP:
+        print(f"Database schema ready in {init_db() * 1000:.0f}ms")
+    if trigger_snapshot is not None:
+        started = time.perf_counter()
+        count = rebuild_snapshot()
+        print(f"Trigger snapshot with {count} triggers written in {(time.perf_counter() - started) * 1000:.0f}ms")
+
 # --- Pydantic Schemas ---
 class ChatResponse(BaseModel):
     trigger: str
@@ -77,6 +127,7 @@ def create_response(chat_response: ChatResponse, db: Session = Depends(get_db)):
     db.add(db_response)
     db.commit()
     db.refresh(db_response)
+    rebuild_snapshot()
     return db_response
 
 @app.put("/responses/{response_id}", response_model=ChatResponseOut)
@@ -89,6 +140,7 @@ def update_response(response_id: int, updated_response: ChatResponse, db: Sessio
         setattr(db_response, key, value)
     db.commit()
     db.refresh(db_response)
+    rebuild_snapshot()
     return db_response
 
 @app.delete("/responses/{response_id}", response_model=ChatResponseOut)
@@ -99,6 +151,7 @@ def delete_response(response_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Response not found")
     db.delete(db_response)
     db.commit()
+    rebuild_snapshot()
     return db_response
 
 @app.get("/respond", response_model=ChatResponseOut)
@@ -108,10 +161,59 @@ def respond_to_input(input_text: str = Query(..., description="The user input to
     Given an input text, find the corresponding active chat response.
     This endpoint can be used by your chat bot to fetch a reply.
     """
+    needle = input_text.lower()
+    # LIKE wildcards in the input keep their database meaning, so only plain text is served from the snapshot
+    if trigger_snapshot is not None and not any(c in needle for c in "%_\\\x00") and trigger_snapshot.available():
+        match = trigger_snapshot.lookup(needle)
+        if match is None:
+            raise HTTPException(status_code=404, detail="No matching response found")
+        response_id, trigger, response = match
+        return {"id": response_id, "trigger": trigger, "response": response, "active": True}
+    
     response_entry = db.query(ChatResponseModel)\
                        .filter(ChatResponseModel.trigger.ilike(f"%{input_text.lower()}%"))\
                        .filter(ChatResponseModel.active == True)\
+                       .order_by(ChatResponseModel.id)\
                        .first()
     if not response_entry:
         raise HTTPException(status_code=404, detail="No matching response found")
     return response_entry
+
+# Serialized trigger n-gram filters per false-positive rate: fp_rate -> (snapshot identity, payload, etag)
+bloom_cache: Dict[float, Tuple[Optional[tuple], bytes, str]] = {}
+
+@app.get("/triggers/bloom")
+def trigger_bloom(fp_rate: float = Query(0.01, gt=0, lt=0.5, description="Target false-positive rate"),
+                  if_none_match: Optional[str] = Header(None),
+                  db: Session = Depends(get_db)):
+    """
+    Bloom filter of active trigger n-grams, so the bot can skip /respond for
+    messages that can't match anything. Supports If-None-Match.
+    """
+    identity = trigger_snapshot.identity() if trigger_snapshot is not None else None
+    cached = bloom_cache.get(fp_rate)
+    if identity is not None and cached is not None and cached[0] == identity:
+        payload, etag = cached[1], cached[2]
+    else:
+        if identity is not None:
+            triggers = [trigger for _, trigger, _ in trigger_snapshot.rows()]
+        else:
+            triggers = [trigger for (trigger,) in db.query(ChatResponseModel.trigger)
+                        .filter(ChatResponseModel.active == True)
+                        .filter(ChatResponseModel.trigger.isnot(None))]
+        payload = build_trigger_filter(triggers, fp_rate).to_bytes()
+        etag = '"' + hashlib.blake2b(payload, digest_size=8).hexdigest() + '"'
+        if identity is not None:
+            if len(bloom_cache) >= 8:
+                bloom_cache.clear()
+            bloom_cache[fp_rate] = (identity, payload, etag)
+    
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=payload, media_type="application/octet-stream", headers={"ETag": etag})
+
+if __name__ == "__main__":
+    # Explicit schema setup, e.g. as a deploy step before starting workers
+    print(f"Database schema ready in {init_db() * 1000:.0f}ms")
+    if trigger_snapshot is not None:
+        print(f"Trigger snapshot written with {rebuild_snapshot()} triggers")
@@ -0,0 +1,85 @@
+import os
+import pickle
+import sqlite3
+import time
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+class StateSnapshot:
+    """Checkpoints in-memory bot state to a SQLite file so restarts are lossless"""
+
+    def __init__(self, data_file: str = "bot_state.db"):
+        """Initialize the snapshot store"""
+        self.data_file = data_file
+        self.sections: Dict[str, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+        self.last_saved: float = 0.0
+
+    def register(self, name: str, dump: Callable[[], Any], restore: Callable[[Any], None]) -> None:
+        """Register a piece of state to include in every snapshot.
+
+        ``dump`` must return plain picklable data (no discord objects);
+        ``restore`` receives that same data back on startup.
+        """
+        self.sections[name] = (dump, restore)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.data_file)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS snapshot ("
+            "section TEXT PRIMARY KEY, payload BLOB NOT NULL, saved_at REAL NOT NULL)"
+        )
+        return conn
+
+    def save(self) -> int:
+        """Write every registered section in a single transaction, returns bytes written"""
+        rows = []
+        for name, (dump, _) in self.sections.items():
+            try:
+                payload = zlib.compress(pickle.dumps(dump(), protocol=pickle.HIGHEST_PROTOCOL))
+                rows.append((name, payload, time.time()))
+            except Exception as e:
+                print(f"Error snapshotting state section '{name}': {str(e)}")
+
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO snapshot (section, payload, saved_at) VALUES (?, ?, ?)",
+                        rows
+                    )
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error saving state snapshot: {str(e)}")
+            return 0
+
+        self.last_saved = time.time()
+        return sum(len(payload) for _, payload, _ in rows)
+
+    def restore(self) -> int:
+        """Restore every registered section found in the snapshot, returns sections restored"""
+        if not os.path.exists(self.data_file):
+            return 0
+
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute("SELECT section, payload FROM snapshot").fetchall()
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Error loading state snapshot: {str(e)}")
+            return 0
+
+        restored = 0
+        for name, payload in rows:
+            if name not in self.sections:
+                continue
+            try:
+                self.sections[name][1](pickle.loads(zlib.decompress(payload)))
+                restored += 1
+            except Exception as e:
+                print(f"Error restoring state section '{name}': {str(e)}")
+
+        return restored
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from ratelimit import CommandLimiter, DEFAULT_COOLDOWNS
+
+def test_commands_without_an_entry_share_the_wildcard_bucket():
+    limiter = CommandLimiter()
+    settings = SimpleNamespace(command_cooldowns={})
+    uses = DEFAULT_COOLDOWNS["*"]["user"][0]
+
+    allowed = [limiter.check(settings, 1, 42, f"!x{i}") == 0 for i in range(uses * 2)]
+
+    assert sum(allowed) == uses
+    assert not any(allowed[uses:])
+
+def test_commands_with_their_own_entry_have_their_own_bucket():
+    limiter = CommandLimiter()
+    settings = SimpleNamespace(command_cooldowns={"!poll": {"user": [1, 60]}})
+
+    assert limiter.check(settings, 1, 42, "!poll") == 0
+    assert limiter.check(settings, 1, 42, "!poll") > 0
+    assert limiter.check(settings, 1, 42, "!other") == 0
+
+def test_dms_have_no_shared_guild_bucket():
+    limiter = CommandLimiter()
+    settings = SimpleNamespace(command_cooldowns={"!poll": {"user": [1, 60], "guild": [1, 60]}})
+
+    assert limiter.check(settings, None, 1, "!poll") == 0
+    assert limiter.check(settings, None, 2, "!poll") == 0
@@ -0,0 +1,198 @@
+"""Read-only, memory-mapped snapshot of the active chat triggers.
+
+The service writes every active (id, trigger, response) into one compact
+file and workers mmap it, so any number of processes share a single
+physical copy through the page cache. Writers build a new file and swap it
+in with os.replace; readers notice the new inode and remap.
+
+File layout (little endian):
+    header   magic, version, count, search offset, search length, text offset
+    starts   count x u32: where each trigger begins in the search blob
+    records  count x (i64 id, u32 trigger off, u32 trigger len, u32 response off, u32 response len)
+    search   lowercased triggers in id order, each followed by a NUL byte
+    text     original triggers and responses, UTF-8
+"""
+import bisect
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: rebuilds aren't serialized across processes
+    fcntl = None
+
+MAGIC = b"TRGS"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIII")
+RECORD = struct.Struct("<qIIII")
+SEPARATOR = b"\x00"
+
+# (id, trigger, response)
+TriggerRow = Tuple[int, str, str]
+
+def write_snapshot(path: str, rows: Iterable[TriggerRow]) -> int:
+    """Serialize rows into a new snapshot and atomically replace path; returns the row count"""
+    rows = sorted(rows, key=lambda row: row[0])
+    starts: List[int] = []
+    records: List[bytes] = []
+    search = bytearray()
+    text = bytearray()
+
+    for row_id, trigger, response in rows:
+        starts.append(len(search))
+        search += trigger.lower().encode("utf-8") + SEPARATOR
+
+        trigger_bytes = trigger.encode("utf-8")
+        response_bytes = response.encode("utf-8")
+        records.append(RECORD.pack(row_id, len(text), len(trigger_bytes),
+                                   len(text) + len(trigger_bytes), len(response_bytes)))
+        text += trigger_bytes + response_bytes
+
+    search_offset = HEADER.size + 4 * len(rows) + RECORD.size * len(rows)
+    text_offset = search_offset + len(search)
+    header = HEADER.pack(MAGIC, VERSION, len(rows), search_offset, len(search), text_offset)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".triggers.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            f.write(struct.pack(f"<{len(starts)}I", *starts))
+            f.write(b"".join(records))
+            f.write(search)
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(rows)
+
+@contextmanager
+def rebuild_lock(path: str) -> Iterator[None]:
+    """Serialize read-DB-then-write rebuilds across worker processes.
+
+    Without it, a worker holding an older view of the table could replace a
+    newer snapshot written a moment earlier by another worker.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class _Mapping:
+    """One mapped snapshot file; immutable so readers can hold it while a newer one is swapped in"""
+    __slots__ = ("identity", "mm", "count", "starts", "search_offset", "search_end", "text_offset")
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, search_offset, search_length, text_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} trigger snapshot")
+        self.count = count
+        self.starts = memoryview(self.mm)[HEADER.size:HEADER.size + 4 * count].cast("I")
+        self.search_offset = search_offset
+        self.search_end = search_offset + search_length
+        self.text_offset = text_offset
+
+    def row(self, index: int) -> TriggerRow:
+        row_id, trigger_off, trigger_len, response_off, response_len = RECORD.unpack_from(
+            self.mm, HEADER.size + 4 * self.count + RECORD.size * index)
+        base = self.text_offset
+        trigger = self.mm[base + trigger_off:base + trigger_off + trigger_len].decode("utf-8")
+        response = self.mm[base + response_off:base + response_off + response_len].decode("utf-8")
+        return row_id, trigger, response
+
+    def find(self, needle: bytes) -> Optional[TriggerRow]:
+        """First row (lowest id) whose lowercased trigger contains needle"""
+        if self.count == 0:
+            return None
+        position = self.mm.find(needle, self.search_offset, self.search_end)
+        if position < 0:
+            return None
+        # Triggers are laid out in id order, so the first hit is the lowest id
+        index = bisect.bisect_right(self.starts, position - self.search_offset) - 1
+        if index < 0:
+            return None
+        return self.row(index)
+
+class TriggerSnapshot:
+    """A worker's view of the snapshot file, remapped when another process replaces it"""
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.mapping: Optional[_Mapping] = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _current(self) -> Optional[_Mapping]:
+        now = time.monotonic()
+        if now - self.checked_at < self.check_interval:
+            return self.mapping
+
+        with self.lock:
+            if now - self.checked_at < self.check_interval:
+                return self.mapping
+            self.checked_at = now
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                self.mapping = None
+                return None
+            identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if self.mapping is None or self.mapping.identity != identity:
+                try:
+                    # The old mapping is released once in-flight readers drop it
+                    self.mapping = _Mapping(self.path)
+                except (OSError, ValueError) as e:
+                    print(f"Error mapping trigger snapshot {self.path}: {e}")
+                    self.mapping = None
+            return self.mapping
+
+    def available(self) -> bool:
+        return self._current() is not None
+
+    def identity(self) -> Optional[tuple]:
+        """(inode, mtime, size) of the mapped file; changes whenever the snapshot is replaced"""
+        mapping = self._current()
+        return mapping.identity if mapping else None
+
+    def invalidate(self) -> None:
+        """Force the next lookup to look at the file again (after this process rewrote it)"""
+        self.checked_at = 0.0
+
+    def lookup(self, text: str) -> Optional[TriggerRow]:
+        """Case-insensitive substring match of text against every trigger, first by id"""
+        mapping = self._current()
+        if mapping is None:
+            return None
+        return mapping.find(text.lower().encode("utf-8"))
+
+    def rows(self) -> Iterator[TriggerRow]:
+        mapping = self._current()
+        if mapping is None:
+            return
+        for index in range(mapping.count):
+            yield mapping.row(index)
+
+    def __len__(self) -> int:
+        mapping = self._current()
+        return mapping.count if mapping else 0
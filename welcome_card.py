@@ -1,13 +1,29 @@
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
+from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import os
 import io
 import aiohttp
 import asyncio
-from typing import Tuple, Optional
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Tuple, Optional, Hashable, Dict, Any, List
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 
-# Create directory for fonts and backgrounds if they don't exist
-os.makedirs("assets/fonts", exist_ok=True)
-os.makedirs("assets/backgrounds", exist_ok=True)
+# Directories for fonts, backgrounds and the image cache, created on first use
+ASSET_DIRS = ["assets/fonts", "assets/backgrounds", "assets/cache/avatars", "assets/cache/backgrounds"]
+_assets_ready = False
+
+def ensure_asset_dirs() -> None:
+    """Create the asset directories once, the first time a card needs them"""
+    global _assets_ready
+    if _assets_ready:
+        return
+    for directory in ASSET_DIRS:
+        os.makedirs(directory, exist_ok=True)
+    _assets_ready = True
 
 # Default font paths - you'll need to provide these fonts or use system fonts
 FONT_REGULAR = "assets/fonts/Poppins-Regular.ttf"
@@ -26,18 +42,541 @@ if not os.path.exists(FONT_REGULAR):
 if not os.path.exists(FONT_BOLD):
     FONT_BOLD = None  # Will use default
 
-async def download_image(url: str) -> Optional[bytes]:
-    """Download an image from a URL"""
+# Card layout (16:9 aspect ratio - looks good in Discord)
+CARD_WIDTH, CARD_HEIGHT = 1200, 675
+AVATAR_SIZE = 180
+AVATAR_BORDER_SIZE = AVATAR_SIZE + 10
+AVATAR_POS_Y = 120  # From top
+
+# Downloads: one shared session, bounded time and size
+DOWNLOAD_TIMEOUT = float(os.getenv("WELCOME_DOWNLOAD_TIMEOUT", "10"))
+DOWNLOAD_MAX_BYTES = int(os.getenv("WELCOME_DOWNLOAD_MAX_BYTES", str(8 * 1024 * 1024)))
+AVATAR_FETCH_SIZE = 256  # Smallest Discord CDN size that covers AVATAR_SIZE
+
+# Decoded images kept in memory (avatars are ~130KB each, backgrounds ~3MB)
+AVATAR_CACHE_SIZE = int(os.getenv("WELCOME_AVATAR_CACHE_SIZE", "128"))
+BACKGROUND_CACHE_SIZE = int(os.getenv("WELCOME_BACKGROUND_CACHE_SIZE", "8"))
+
+# Pre-processed PNGs kept on disk under assets/cache; the oldest are pruned past these counts
+AVATAR_DISK_CACHE_FILES = int(os.getenv("WELCOME_AVATAR_DISK_CACHE_FILES", "2000"))
+BACKGROUND_DISK_CACHE_FILES = int(os.getenv("WELCOME_BACKGROUND_DISK_CACHE_FILES", "64"))
+
+# How many (guild, accent color, background) templates to keep rendered
+TEMPLATE_CACHE_SIZE = int(os.getenv("WELCOME_TEMPLATE_CACHE_SIZE", "64"))
+
+# Off-loop rendering: worker threads and how many cards may be queued before we fall back to a plain embed
+RENDER_WORKERS = int(os.getenv("WELCOME_RENDER_WORKERS", "2"))
+RENDER_QUEUE_DEPTH = int(os.getenv("WELCOME_RENDER_QUEUE_DEPTH", "16"))
+
+# Output encodings: name -> (Pillow format, file extension, save options)
+CARD_FORMATS: Dict[str, Tuple[str, str, Dict[str, Any]]] = {
+    "png": ("PNG", "png", {"compress_level": 3}),  # Lossless, much faster than the default level 6
+    "png_palette": ("PNG", "png", {"optimize": True}),  # 256-color quantized, small but slow to encode
+    "webp": ("WEBP", "webp", {"quality": 85, "method": 2}),
+    "jpeg": ("JPEG", "jpg", {"quality": 85}),
+}
+DEFAULT_CARD_FORMAT = "png"
+
+# Order tried when a byte budget is set, fastest encoder first
+FASTEST_CARD_FORMATS = ["jpeg", "webp", "png", "png_palette"]
+
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """Return the shared download session, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT))
+    return _session
+
+async def close_session() -> None:
+    """Close the shared download session"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def sized_avatar_url(url: str, size: int = AVATAR_FETCH_SIZE) -> str:
+    """Ask the Discord CDN for a small rendition instead of the full-size avatar"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query["size"] = str(size)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+def image_cache_key(url: str) -> str:
+    """Cache key for an image URL; the query string (size, format) is ignored.
+
+    Discord avatar paths embed the avatar hash, so a new avatar gets a new key.
+    """
+    parts = urlsplit(url)
+    return hashlib.sha1(f"{parts.netloc}{parts.path}".encode()).hexdigest()
+
+async def download_image(url: str, max_bytes: int = DOWNLOAD_MAX_BYTES) -> Optional[bytes]:
+    """Download an image from a URL, giving up on anything larger than max_bytes"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.read()
+        async with get_session().get(url) as response:
+            if response.status != 200:
+                return None
+            if response.content_length and response.content_length > max_bytes:
+                print(f"Image too large ({response.content_length} bytes): {url}")
                 return None
+            
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                data.extend(chunk)
+                if len(data) > max_bytes:
+                    print(f"Image exceeded {max_bytes} bytes: {url}")
+                    return None
+            return bytes(data)
     except Exception as e:
         print(f"Error downloading image: {e}")
         return None
 
+class ImageCache:
+    """Two-tier cache of decoded, pre-processed images: memory LRU backed by PNGs on disk"""
+
+    def __init__(self, directory: str, max_size: int, max_files: int):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_files = max_files
+        self.images: "OrderedDict[str, Image.Image]" = OrderedDict()
+        self.lock = threading.Lock()
+        # PNGs on disk, counted on the first put so pruning doesn't list the directory every time
+        self.disk_files: Optional[int] = None
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def has(self, key: str) -> bool:
+        """Cheap check used on the event loop to decide whether to download"""
+        with self.lock:
+            if key in self.images:
+                return True
+        return os.path.exists(self._path(key))
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+                return image
+        
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with Image.open(path) as stored:
+                image = stored.convert("RGBA")
+        except Exception as e:
+            print(f"Error reading cached image {path}: {e}")
+            return None
+        self._remember(key, image)
+        return image
+
+    def put(self, key: str, image: Image.Image) -> None:
+        self._remember(key, image)
+        ensure_asset_dirs()
+        # Write to a temp file first so a reader never sees a half-written PNG
+        path = self._path(key)
+        is_new = not os.path.exists(path)
+        try:
+            image.save(f"{path}.tmp", format="PNG")
+            os.replace(f"{path}.tmp", path)
+        except Exception as e:
+            print(f"Error writing cached image {path}: {e}")
+            return
+        with self.lock:
+            if self.disk_files is None:
+                self.disk_files = len(self._disk_paths())
+            elif is_new:
+                self.disk_files += 1
+            if self.disk_files > self.max_files:
+                self._prune()
+
+    def _disk_paths(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith(".png")]
+
+    def _prune(self) -> None:
+        """Delete the least recently written PNGs until the disk tier is back under max_files"""
+        paths = []
+        for path in self._disk_paths():
+            try:
+                paths.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        paths.sort()
+        excess = len(paths) - self.max_files
+        for _, path in paths[:max(excess, 0)]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Error pruning cached image {path}: {e}")
+        self.disk_files = min(len(paths), self.max_files)
+
+    def _remember(self, key: str, image: Image.Image) -> None:
+        with self.lock:
+            self.images[key] = image
+            self.images.move_to_end(key)
+            while len(self.images) > self.max_size:
+                self.images.popitem(last=False)
+
+avatar_cache = ImageCache("assets/cache/avatars", AVATAR_CACHE_SIZE, AVATAR_DISK_CACHE_FILES)
+background_cache = ImageCache("assets/cache/backgrounds", BACKGROUND_CACHE_SIZE, BACKGROUND_DISK_CACHE_FILES)
+
+@lru_cache(maxsize=32)
+def load_font(path: Optional[str], size: int):
+    """Load a font once and reuse it for every card"""
+    try:
+        return ImageFont.truetype(path, size) if path else ImageFont.load_default()
+    except Exception as e:
+        print(f"Error loading fonts: {e} - Using default fonts")
+        return ImageFont.load_default()
+
+class CardTemplate:
+    """Pre-rendered static layers of a welcome card"""
+    __slots__ = ("base", "avatar_mask", "avatar_border")
+
+    def __init__(self, base: Image.Image, avatar_mask: Image.Image, avatar_border: Image.Image):
+        self.base = base
+        self.avatar_mask = avatar_mask
+        self.avatar_border = avatar_border
+
+class TemplateCache:
+    """Small LRU cache of card templates keyed by (guild, accent color, background)"""
+
+    def __init__(self, max_size: int = TEMPLATE_CACHE_SIZE):
+        self.max_size = max_size
+        self.templates: "OrderedDict[Hashable, CardTemplate]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Render worker threads and the event loop both touch the cache
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CardTemplate]:
+        with self.lock:
+            template = self.templates.get(key)
+            if template is None:
+                self.misses += 1
+                return None
+            self.templates.move_to_end(key)
+            self.hits += 1
+            return template
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.templates
+
+    def put(self, key: Hashable, template: CardTemplate) -> None:
+        with self.lock:
+            self.templates[key] = template
+            self.templates.move_to_end(key)
+            while len(self.templates) > self.max_size:
+                self.templates.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.templates.clear()
+
+template_cache = TemplateCache()
+
+def prepare_background(bg_data: bytes) -> Image.Image:
+    """Resize, crop, blur and darken a custom background to card size"""
+    background = Image.open(io.BytesIO(bg_data)).convert("RGBA")
+    # Resize and crop to fit our card dimensions
+    bg_ratio = max(CARD_WIDTH / background.width, CARD_HEIGHT / background.height)
+    bg_width = int(background.width * bg_ratio)
+    bg_height = int(background.height * bg_ratio)
+    background = background.resize((bg_width, bg_height), Image.LANCZOS)
+    
+    # Center crop
+    left = (bg_width - CARD_WIDTH) // 2
+    top = (bg_height - CARD_HEIGHT) // 2
+    background = background.crop((left, top, left + CARD_WIDTH, top + CARD_HEIGHT))
+    
+    # Apply slight blur and darken for better text visibility
+    background = background.filter(ImageFilter.GaussianBlur(5))
+    overlay = Image.new('RGBA', (CARD_WIDTH, CARD_HEIGHT), (0, 0, 0, 110))  # Semi-transparent black
+    return Image.alpha_composite(background, overlay)
+
+def build_template(accent_color: Tuple[int, int, int], background: Optional[Image.Image] = None) -> CardTemplate:
+    """Composite every layer of the card that doesn't depend on the member"""
+    width, height = CARD_WIDTH, CARD_HEIGHT
+    card = background.copy() if background is not None else Image.new('RGBA', (width, height), DARK_BG)
+    draw = ImageDraw.Draw(card)
+    
+    # Top and bottom accent bars
+    draw.rectangle([(0, 0), (width, 8)], fill=accent_color)  # Top bar
+    draw.rectangle([(0, height-8), (width, height)], fill=accent_color)  # Bottom bar
+    
+    # Subtle top-to-bottom gradient: build one column of alpha values and stretch it
+    alpha_column = Image.new('L', (1, height))
+    alpha_column.putdata([int(150 - (y / height * 80)) for y in range(height)])
+    gradient = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    gradient.putalpha(alpha_column.resize((width, height), Image.NEAREST))
+    
+    card = Image.alpha_composite(card, gradient)
+    draw = ImageDraw.Draw(card)
+    
+    # Static text: title and bottom decoration
+    center_x = width // 2
+    welcome_y = AVATAR_POS_Y + AVATAR_BORDER_SIZE + 30
+    draw.text((center_x, welcome_y), "WELCOME", fill=LIGHT_TEXT, font=load_font(FONT_BOLD, 36), anchor="mt")
+    draw.text((center_x, height - 50), "• • •", fill=accent_color, font=load_font(FONT_REGULAR, 28), anchor="mt")
+    
+    # Circular mask for the avatar
+    avatar_mask = Image.new('L', (AVATAR_SIZE, AVATAR_SIZE), 0)
+    ImageDraw.Draw(avatar_mask).ellipse((0, 0, AVATAR_SIZE, AVATAR_SIZE), fill=255)
+    
+    # A slightly larger circle for the avatar border
+    border_size = AVATAR_BORDER_SIZE
+    avatar_border = Image.new('RGBA', (border_size, border_size), accent_color)
+    border_mask = Image.new('L', (border_size, border_size), 0)
+    ImageDraw.Draw(border_mask).ellipse((0, 0, border_size, border_size), fill=255)
+    avatar_border.putalpha(border_mask)
+    
+    return CardTemplate(card, avatar_mask, avatar_border)
+
+def compose_card(
+    template: CardTemplate,
+    avatar: Optional[Image.Image],
+    username: str,
+    accent_color: Tuple[int, int, int]
+) -> Image.Image:
+    """Copy the template and paste the circular, bordered avatar onto it"""
+    if avatar is None:
+        # If avatar can't be downloaded, create a placeholder
+        avatar = Image.new('RGBA', (256, 256), accent_color)
+        avatar_draw = ImageDraw.Draw(avatar)
+        avatar_draw.text((128, 128), username[0].upper(), fill=LIGHT_TEXT, anchor='mm',
+                       font=load_font(FONT_BOLD, 100))
+    
+    # Resize avatar and cut it into a circle
+    avatar_circle = avatar.resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+    avatar_circle.putalpha(template.avatar_mask)
+    
+    # Center the avatar on the border
+    avatar_with_border = template.avatar_border.copy()
+    avatar_with_border.paste(avatar_circle, (5, 5), avatar_circle)
+    
+    # Place avatar with border on card
+    card = template.base.copy()
+    avatar_pos_x = (CARD_WIDTH - AVATAR_BORDER_SIZE) // 2
+    card.paste(avatar_with_border, (avatar_pos_x, AVATAR_POS_Y), avatar_with_border)
+    return card
+
+def draw_member_text(
+    card: Image.Image,
+    username: str,
+    server_name: str,
+    member_count: int,
+    custom_message: Optional[str] = None
+) -> Image.Image:
+    """Draw the username, message and member count onto a composed card"""
+    draw = ImageDraw.Draw(card)
+    
+    # Calculate positions
+    center_x = CARD_WIDTH // 2
+    welcome_y = AVATAR_POS_Y + AVATAR_BORDER_SIZE + 30
+    
+    # Add username (smaller font if too long)
+    username_y = welcome_y + 50
+    username_font = load_font(FONT_BOLD, 40 if len(username) > 20 else 60)
+    draw.text((center_x, username_y), username, fill=LIGHT_TEXT, font=username_font, anchor="mt")
+    
+    # Add custom message or default message
+    message = custom_message or f"Welcome to {server_name}!"
+    message_y = username_y + 70
+    draw.text((center_x, message_y), message, fill=LIGHT_TEXT, font=load_font(FONT_REGULAR, 28), anchor="mt")
+    
+    # Add member count with a nice label
+    count_y = message_y + 60
+    draw.text((center_x, count_y), f"You are the {member_count}{'th' if member_count % 10 != 1 else 'st'} member", 
+             fill=SECONDARY_COLOR, font=load_font(FONT_REGULAR, 24), anchor="mt")
+    
+    return card
+
+def render_card(
+    template: CardTemplate,
+    avatar: Optional[Image.Image],
+    username: str,
+    server_name: str,
+    member_count: int,
+    accent_color: Tuple[int, int, int],
+    custom_message: Optional[str] = None
+) -> Image.Image:
+    """Paste the avatar and draw the member-specific text onto a template"""
+    card = compose_card(template, avatar, username, accent_color)
+    return draw_member_text(card, username, server_name, member_count, custom_message)
+
+def encode_with(card: Image.Image, output_format: str) -> io.BytesIO:
+    """Encode a card in one of CARD_FORMATS; the buffer's name carries the extension"""
+    pil_format, extension, options = CARD_FORMATS[output_format]
+    if output_format == "png_palette":
+        card = card.quantize(colors=256, method=Image.FASTOCTREE)
+    elif pil_format == "JPEG":
+        card = card.convert("RGB")
+    
+    buffer = io.BytesIO()
+    card.save(buffer, format=pil_format, **options)
+    buffer.seek(0)
+    buffer.name = f"card.{extension}"
+    return buffer
+
+def encode_card(card: Image.Image, output_format: str = DEFAULT_CARD_FORMAT, max_bytes: Optional[int] = None) -> io.BytesIO:
+    """Encode a card, honouring an optional byte budget.
+
+    "auto" (or an unknown format) with a budget picks the fastest encoding
+    that fits. An explicit format is used as-is unless it exceeds the budget,
+    in which case the remaining formats are tried fastest first. If nothing
+    fits, the smallest encoding is returned.
+    """
+    if output_format not in CARD_FORMATS:
+        output_format = "auto" if max_bytes else DEFAULT_CARD_FORMAT
+    if not max_bytes:
+        return encode_with(card, output_format)
+    
+    candidates = [fmt for fmt in FASTEST_CARD_FORMATS if fmt != output_format]
+    if output_format in CARD_FORMATS:
+        candidates.insert(0, output_format)
+    
+    smallest = None
+    for fmt in candidates:
+        buffer = encode_with(card, fmt)
+        size = buffer.getbuffer().nbytes
+        if size <= max_bytes:
+            return buffer
+        if smallest is None or size < smallest.getbuffer().nbytes:
+            smallest = buffer
+    return smallest
+
+def load_avatar(avatar_key: str, avatar_data: Optional[bytes]) -> Optional[Image.Image]:
+    """Decoded avatar already resized to AVATAR_SIZE, from cache or freshly downloaded bytes"""
+    avatar = avatar_cache.get(avatar_key)
+    if avatar is None and avatar_data:
+        avatar = Image.open(io.BytesIO(avatar_data)).convert("RGBA")
+        avatar = avatar.resize((AVATAR_SIZE, AVATAR_SIZE), Image.LANCZOS)
+        avatar_cache.put(avatar_key, avatar)
+    return avatar
+
+def load_background(background_key: Optional[str], bg_data: Optional[bytes]) -> Optional[Image.Image]:
+    """Blurred, card-sized background from cache or freshly downloaded bytes"""
+    if background_key is None:
+        return None
+    background = background_cache.get(background_key)
+    if background is None and bg_data:
+        background = prepare_background(bg_data)
+        background_cache.put(background_key, background)
+    return background
+
+def render_welcome_card(
+    template_key: Hashable,
+    avatar_key: str,
+    avatar_data: Optional[bytes],
+    username: str,
+    server_name: str,
+    member_count: int,
+    accent_color: Tuple[int, int, int],
+    custom_message: Optional[str] = None,
+    background_key: Optional[str] = None,
+    bg_data: Optional[bytes] = None,
+    output_format: str = DEFAULT_CARD_FORMAT,
+    max_bytes: Optional[int] = None
+) -> io.BytesIO:
+    """Do all the Pillow work for one card; runs on a render worker thread"""
+    template = template_cache.get(template_key)
+    if template is None:
+        background = load_background(background_key, bg_data)
+        template = build_template(accent_color, background)
+        # A failed background download renders this card plain, but isn't cached as the guild's template
+        if background_key is None or background is not None:
+            template_cache.put(template_key, template)
+    
+    avatar = load_avatar(avatar_key, avatar_data)
+    card = render_card(template, avatar, username, server_name, member_count, accent_color, custom_message)
+    
+    return encode_card(card, output_format, max_bytes)
+
+class CardRenderer:
+    """Bounded thread pool that keeps card rendering off the event loop.
+
+    Pillow releases the GIL for resize, filter, composite and encode, so
+    threads give real parallelism while sharing one template cache.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, queue_depth: int = RENDER_QUEUE_DEPTH):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.pending = 0  # Cards admitted and not finished yet, downloads included
+        
+        # Render-time metrics
+        self.rendered = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def saturated(self) -> bool:
+        """True when the render queue is full and callers should fall back"""
+        return self.pending >= self.queue_depth
+
+    def admit(self) -> bool:
+        """Take a queue slot for a card, or count a rejection if the queue is full.
+
+        Callers take the slot before downloading so the queue depth bounds the
+        downloads as well as the renders, and give it back with release().
+        """
+        if self.saturated():
+            self.rejected += 1
+            return False
+        self.pending += 1
+        return True
+
+    def release(self) -> None:
+        self.pending -= 1
+
+    async def render(self, *args: Any) -> Optional[io.BytesIO]:
+        """Render a card on the pool; the caller holds a slot from admit()"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="welcome-card")
+        
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            buffer = await loop.run_in_executor(self.executor, render_welcome_card, *args)
+        except Exception as e:
+            self.failed += 1
+            print(f"Error rendering welcome card: {e}")
+            return None
+        
+        elapsed = time.perf_counter() - started
+        self.rendered += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        return buffer
+
+    def stats(self) -> Dict[str, Any]:
+        """Render-time metrics since startup"""
+        return {
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "pending": self.pending,
+            "avg_ms": round(self.total_seconds / self.rendered * 1000, 1) if self.rendered else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 1),
+        }
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+renderer = CardRenderer()
+
 async def create_welcome_card(
     username: str, 
     avatar_url: str, 
@@ -45,150 +584,44 @@ async def create_welcome_card(
     member_count: int, 
     background_url: Optional[str] = None,
     accent_color: Tuple[int, int, int] = ACCENT_COLOR,
-    custom_message: Optional[str] = None
+    custom_message: Optional[str] = None,
+    guild_id: Optional[str] = None,
+    output_format: str = DEFAULT_CARD_FORMAT,
+    max_bytes: Optional[int] = None
 ) -> Optional[io.BytesIO]:
-    """Create a stylish welcome card for new members"""
+    """Create a stylish welcome card for new members.
+
+    Only the downloads happen on the event loop; returns None (so callers
+    use the plain embed) when rendering fails or the render queue is full.
+    The returned buffer's ``name`` has the extension of the chosen encoding.
+    """
+    if not renderer.admit():
+        return None
     try:
-        # Card dimensions (16:9 aspect ratio - looks good in Discord)
-        width, height = 1200, 675
-        
-        # Create base image with dark background
-        card = Image.new('RGBA', (width, height), DARK_BG)
-        draw = ImageDraw.Draw(card)
-        
-        # Load custom background if provided
-        if background_url:
+        # Static layers are rendered once per (guild, accent color, background),
+        # so the background only needs downloading when neither cache has it
+        template_key = (guild_id, tuple(accent_color), background_url)
+        background_key = image_cache_key(background_url) if background_url else None
+        bg_data = None
+        if background_key and template_key not in template_cache and not background_cache.has(background_key):
             bg_data = await download_image(background_url)
-            if bg_data:
-                background = Image.open(io.BytesIO(bg_data)).convert("RGBA")
-                # Resize and crop to fit our card dimensions
-                bg_ratio = max(width / background.width, height / background.height)
-                bg_width = int(background.width * bg_ratio)
-                bg_height = int(background.height * bg_ratio)
-                background = background.resize((bg_width, bg_height), Image.LANCZOS)
-                
-                # Center crop
-                left = (bg_width - width) // 2
-                top = (bg_height - height) // 2
-                background = background.crop((left, top, left + width, top + height))
-                
-                # Apply slight blur and darken for better text visibility
-                background = background.filter(ImageFilter.GaussianBlur(5))
-                overlay = Image.new('RGBA', (width, height), (0, 0, 0, 110))  # Semi-transparent black
-                background = Image.alpha_composite(background, overlay)
-                
-                # Use the background
-                card = background
-                draw = ImageDraw.Draw(card)
-        
-        # Add decorative elements
-        # Top and bottom accent bars
-        draw.rectangle([(0, 0), (width, 8)], fill=accent_color)  # Top bar
-        draw.rectangle([(0, height-8), (width, height)], fill=accent_color)  # Bottom bar
-        
-        # Add a subtle gradient overlay
-        gradient = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-        gradient_draw = ImageDraw.Draw(gradient)
-        for y in range(height):
-            # Create a gradient from top to bottom
-            alpha = int(150 - (y / height * 80))  # Fade from visible to less visible
-            gradient_draw.line([(0, y), (width, y)], fill=(0, 0, 0, alpha))
-        
-        card = Image.alpha_composite(card, gradient)
-        draw = ImageDraw.Draw(card)
-        
-        # Download and process avatar
-        avatar_data = await download_image(avatar_url)
-        if not avatar_data:
-            # If avatar can't be downloaded, create a placeholder
-            avatar = Image.new('RGBA', (256, 256), accent_color)
-            avatar_draw = ImageDraw.Draw(avatar)
-            avatar_draw.text((128, 128), username[0].upper(), fill=LIGHT_TEXT, anchor='mm',
-                           font=ImageFont.truetype(FONT_BOLD, 100) if FONT_BOLD else ImageFont.load_default())
-        else:
-            avatar = Image.open(io.BytesIO(avatar_data)).convert("RGBA")
-        
-        # Resize avatar to desired size
-        avatar_size = 180
-        avatar = avatar.resize((avatar_size, avatar_size), Image.LANCZOS)
-        
-        # Create circular mask for avatar
-        mask = Image.new('L', (avatar_size, avatar_size), 0)
-        mask_draw = ImageDraw.Draw(mask)
-        mask_draw.ellipse((0, 0, avatar_size, avatar_size), fill=255)
         
-        # Apply circular mask to avatar
-        avatar_circle = ImageOps.fit(avatar, mask.size, centering=(0.5, 0.5))
-        avatar_circle.putalpha(mask)
+        # Repeat joins and previews reuse the cached, pre-resized avatar
+        avatar_key = image_cache_key(avatar_url)
+        avatar_data = None
+        if not avatar_cache.has(avatar_key):
+            avatar_data = await download_image(sized_avatar_url(avatar_url))
         
-        # Create a slightly larger circle for the avatar border
-        border_size = avatar_size + 10
-        avatar_border = Image.new('RGBA', (border_size, border_size), accent_color)
-        border_mask = Image.new('L', (border_size, border_size), 0)
-        border_draw = ImageDraw.Draw(border_mask)
-        border_draw.ellipse((0, 0, border_size, border_size), fill=255)
-        avatar_border.putalpha(border_mask)
-        
-        # Center the avatar on the border
-        avatar_with_border = avatar_border.copy()
-        avatar_with_border.paste(avatar_circle, (5, 5), avatar_circle)
-        
-        # Position for the avatar
-        avatar_pos_x = (width - border_size) // 2
-        avatar_pos_y = 120  # From top
-        
-        # Place avatar with border on card
-        card.paste(avatar_with_border, (avatar_pos_x, avatar_pos_y), avatar_with_border)
-        
-        # Load fonts with fallbacks
-        try:
-            username_font = ImageFont.truetype(FONT_BOLD, 60) if FONT_BOLD else ImageFont.load_default()
-            title_font = ImageFont.truetype(FONT_BOLD, 36) if FONT_BOLD else ImageFont.load_default()
-            subtitle_font = ImageFont.truetype(FONT_REGULAR, 28) if FONT_REGULAR else ImageFont.load_default()
-            small_font = ImageFont.truetype(FONT_REGULAR, 24) if FONT_REGULAR else ImageFont.load_default()
-        except Exception as e:
-            print(f"Error loading fonts: {e} - Using default fonts")
-            username_font = ImageFont.load_default()
-            title_font = ImageFont.load_default()
-            subtitle_font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
-        
-        # Calculate positions
-        center_x = width // 2
-        
-        # Add welcome text
-        welcome_y = avatar_pos_y + border_size + 30
-        draw.text((center_x, welcome_y), "WELCOME", fill=LIGHT_TEXT, font=title_font, anchor="mt")
-        
-        # Add username (with proper text wrapping if too long)
-        username_y = welcome_y + 50
-        if len(username) > 20:
-            username_font = ImageFont.truetype(FONT_BOLD, 40) if FONT_BOLD else ImageFont.load_default()
-        draw.text((center_x, username_y), username, fill=LIGHT_TEXT, font=username_font, anchor="mt")
-        
-        # Add custom message or default message
-        message = custom_message or f"Welcome to {server_name}!"
-        message_y = username_y + 70
-        draw.text((center_x, message_y), message, fill=LIGHT_TEXT, font=subtitle_font, anchor="mt")
-        
-        # Add member count with a nice label
-        count_y = message_y + 60
-        draw.text((center_x, count_y), f"You are the {member_count}{'th' if member_count % 10 != 1 else 'st'} member", 
-                 fill=SECONDARY_COLOR, font=small_font, anchor="mt")
-        
-        # Add decorative element at bottom
-        decoration_y = height - 50
-        draw.text((center_x, decoration_y), "• • •", fill=accent_color, font=subtitle_font, anchor="mt")
-        
-        # Save to buffer
-        buffer = io.BytesIO()
-        card.save(buffer, format="PNG")
-        buffer.seek(0)
-        
-        return buffer
+        return await renderer.render(
+            template_key, avatar_key, avatar_data, username, server_name, member_count,
+            accent_color, custom_message, background_key, bg_data,
+            output_format, max_bytes
+        )
     except Exception as e:
         print(f"Error creating welcome card: {e}")
         return None
+    finally:
+        renderer.release()
 
 # Function to generate an embed alongside the welcome image
 def create_welcome_embed(username, server_name, member_count, user_id):